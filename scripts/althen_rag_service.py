@@ -154,9 +154,7 @@ class AlthenRAGService:
             text = soup.get_text()
             
             # Rensa text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            clean_text = ' '.join(chunk for chunk in chunks if chunk)
+            clean_text = ' '.join(text.split())
             
             # Begränsa för testning (första 2000 tecken)
             if len(clean_text) > 2000:
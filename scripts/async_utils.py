@@ -0,0 +1,158 @@
+"""
+Asyncio helpers shared by the LightRAG scripts: retry backoff, an adaptive
+(AIMD) concurrency limit and a size/time micro-batcher
+"""
+import asyncio
+import contextlib
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=30):
+    """Seconds to wait before retry `attempt`: Retry-After when given, else full-jitter exponential"""
+    try:
+        return min(float(retry_after), cap)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveLimiter:
+    """Async concurrency limit driven by the server's feedback (AIMD)
+
+    Used like a semaphore. Callers report each response with record(); every
+    `window` seconds the limit is halved if more than `decrease_rate` of the
+    requests were throttled (or, with a latency_target, their mean latency was
+    above it) and grown by `step` permits if fewer than `increase_rate` were.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, window=10, decrease_rate=0.05,
+                 increase_rate=0.01, step=1, latency_target=None, name="LightRAG server"):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.window = window
+        self.decrease_rate = decrease_rate
+        self.increase_rate = increase_rate
+        self.step = step
+        self.latency_target = latency_target
+        self.name = name
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now):
+        self._ok = 0
+        self._throttled = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._window_start = now
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def record(self, throttled, latency=None):
+        if throttled:
+            self._throttled += 1
+        else:
+            self._ok += 1
+        if latency is not None:
+            self._latency_sum += latency
+            self._latency_count += 1
+        now = time.monotonic()
+        if now - self._window_start < self.window:
+            return
+
+        rate = self._throttled / (self._ok + self._throttled)
+        mean_latency = self._latency_sum / self._latency_count if self._latency_count else 0.0
+        slow = self.latency_target is not None and mean_latency > self.latency_target
+        if rate > self.decrease_rate or slow:
+            self.limit = max(self.minimum, self.limit / 2)
+            reason = f"slow (mean {mean_latency:.1f}s)" if slow else f"throttling ({rate:.0%})"
+            logger.warning(f"[WARNING] {self.name} {reason}, concurrency limit now {int(self.limit)}")
+        elif rate < self.increase_rate:
+            self.limit = min(self.maximum, self.limit + self.step)
+        self._reset_window(now)
+
+
+class MicroBatcher:
+    """Coalesce single submissions into batches for an async flush function
+
+    submit() queues an item and returns a Future. A background task collects
+    items until batch_max are waiting or batch_ms milliseconds after the first
+    arrived, then runs flush_fn(items) as its own task. flush_fn returns one
+    result per item; if it raises, every Future in the batch gets the error.
+    """
+
+    def __init__(self, flush_fn, batch_max, batch_ms):
+        self.flush_fn = flush_fn
+        self.batch_max = batch_max
+        self.batch_ms = batch_ms
+        self._queue = None
+        self._consumer = None
+        self._loop = None
+        self._flushes = set()
+
+    async def submit(self, item):
+        self._ensure_consumer()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return future
+
+    def _ensure_consumer(self):
+        loop = asyncio.get_running_loop()
+        if self._consumer is None or self._consumer.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._consumer = loop.create_task(self._consume())
+
+    async def _consume(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_ms / 1000
+            while len(batch) < self.batch_max:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = self._loop.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        try:
+            results = await self.flush_fn([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    async def close(self):
+        """Wait until every submitted item has been flushed, then stop the background task"""
+        if self._consumer is None:
+            return
+        await self._queue.join()
+        self._consumer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._consumer
+        self._consumer = None
@@ -38,7 +38,7 @@ async def get_unprocessed_pages(limit=5, subcategory=None, datasheet_count=None)
             logger.info(f"Filtering for subcategory: {subcategory}")
         
         # Get pages
-        response = query.limit(limit * 3).execute()  # Get more to filter by datasheet count
+        response = query.limit(limit * 2).execute()  # Get a few extra to filter by datasheet count
         pages = response.data if response.data else []
         
         # Filter by datasheet count if specified
@@ -57,13 +57,13 @@ async def get_unprocessed_pages(limit=5, subcategory=None, datasheet_count=None)
                 if actual_count == datasheet_count:
                     filtered_pages.append(page)
                     if datasheet_count == 0:
-                        logger.info(f"Page {page['id']} ({page.get('subcategory', 'unknown')}) has NO datasheets (web content only)")
+                        logger.debug("Page %s (%s) has NO datasheets (web content only)", page['id'], page.get('subcategory', 'unknown'))
                     else:
-                        logger.info(f"Page {page['id']} ({page.get('subcategory', 'unknown')}) has exactly {actual_count} datasheet(s)")
+                        logger.debug("Page %s (%s) has exactly %d datasheet(s)", page['id'], page.get('subcategory', 'unknown'), actual_count)
             else:
                 # No datasheet filter, include all
                 filtered_pages.append(page)
-                logger.info(f"Page {page['id']} ({page.get('subcategory', 'unknown')}) has {actual_count} datasheet(s)")
+                logger.debug("Page %s (%s) has %d datasheet(s)", page['id'], page.get('subcategory', 'unknown'), actual_count)
             
             # Stop if we have enough pages
             if len(filtered_pages) >= limit:
@@ -120,24 +120,24 @@ async def process_batch(subcategory=None, datasheet_count=None, batch_size=3):
     
     for page in pages:
         try:
-            logger.info(f"Processing page {page['id']}: {page['url'][:50]}...")
+            logger.info("Processing page %s: %.50s...", page['id'], page['url'])
             result = await process_page_enhance_alt_text(page['id'])
             
             results["processed"] += 1
             
             if result['success']:
                 results["success"] += 1
-                logger.info(f"✅ Successfully processed page {page['id']}")
-                logger.info(f"   - Content length: {result.get('content_length', 0):,} chars")
-                logger.info(f"   - Images uploaded: {result.get('images_uploaded', 0)}")
-                logger.info(f"   - Datasheets: {result.get('datasheets_processed', 0)}")
+                logger.info("✅ Successfully processed page %s", page['id'])
+                logger.debug("   - Content length: %d chars", result.get('content_length', 0))
+                logger.debug("   - Images uploaded: %s", result.get('images_uploaded', 0))
+                logger.debug("   - Datasheets: %s", result.get('datasheets_processed', 0))
             else:
                 results["failed"] += 1
-                logger.error(f"❌ Failed to process page {page['id']}: {result.get('error')}")
+                logger.error("❌ Failed to process page %s: %s", page['id'], result.get('error'))
                 
         except Exception as e:
             results["failed"] += 1
-            logger.error(f"Error processing page {page['id']}: {e}")
+            logger.error("Error processing page %s: %s", page['id'], e)
             continue
         
         # Small delay between pages to avoid overwhelming services
@@ -7,6 +7,7 @@ import os
 import sys
 import asyncio
 import random
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 import logging
@@ -23,63 +24,58 @@ WORKER_ID = os.getenv('WORKER_ID', str(random.randint(1, 999)))
 async def get_unprocessed_pages(limit=10, subcategory=None, datasheet_count=None):
     """
     Get pages that haven't been processed yet with specific filters
-    Modified to handle concurrent workers by using row-level locking
+    Filtering (datasheet count, subcategory, processing lock) is done in Postgres
+    by the fetch_unprocessed_pages RPC (see scripts/fetch_unprocessed_pages.sql),
+    which returns pages in random order so concurrent workers pick different ones.
+    Falls back to client-side filtering when the RPC has not been deployed.
     """
     try:
         supabase = get_supabase_client()
         
-        # Build query for unprocessed pages
-        query = supabase.table("new_pages_index")\
-            .select("*")\
-            .or_("rag_ingested.eq.false,rag_ingested.is.null")
-        
-        # Add subcategory filter if specified
         if subcategory:
-            query = query.eq("subcategory", subcategory)
             logger.info(f"[Worker {WORKER_ID}] Filtering for subcategory: {subcategory}")
         
-        # Get more pages than needed to handle concurrent workers
-        response = query.limit(limit * 5).execute()
-        pages = response.data if response.data else []
-        
-        # Shuffle to reduce conflicts between workers
-        random.shuffle(pages)
-        
-        # Filter by datasheet count if specified
-        filtered_pages = []
-        for page in pages:
-            # Skip if already being processed (check for lock)
-            if page.get('processing_locked'):
-                continue
-                
-            # Count datasheets for this page
-            datasheet_response = supabase.table("new_datasheets_index")\
-                .select("id", count="exact")\
-                .eq("parent_url", page['url'])\
-                .execute()
-            
-            actual_count = len(datasheet_response.data) if datasheet_response.data else 0
-            
-            # Apply datasheet count filter if specified
-            if datasheet_count is not None:
-                if actual_count == datasheet_count:
-                    filtered_pages.append(page)
-                    logger.info(f"[Worker {WORKER_ID}] Page {page['id']} has {actual_count} datasheet(s)")
-            else:
-                filtered_pages.append(page)
-                logger.info(f"[Worker {WORKER_ID}] Page {page['id']} has {actual_count} datasheet(s)")
-            
-            # Stop if we have enough pages
-            if len(filtered_pages) >= limit:
-                break
+        try:
+            response = supabase.rpc("fetch_unprocessed_pages", {
+                "p_limit": limit,
+                "p_datasheet_count": datasheet_count,
+                "p_subcategory": subcategory
+            }).execute()
+            pages = response.data if response.data else []
+        except Exception as e:
+            logger.warning(f"[Worker {WORKER_ID}] fetch_unprocessed_pages RPC unavailable ({e}), filtering client-side")
+            pages = _get_unprocessed_pages_fallback(supabase, limit, subcategory, datasheet_count)
         
-        logger.info(f"[Worker {WORKER_ID}] Found {len(filtered_pages)} pages matching criteria")
-        return filtered_pages
+        logger.info(f"[Worker {WORKER_ID}] Found {len(pages)} pages matching criteria")
+        return pages
         
     except Exception as e:
         logger.error(f"[Worker {WORKER_ID}] Error fetching unprocessed pages: {e}")
         return []
 
+def _get_unprocessed_pages_fallback(supabase, limit, subcategory=None, datasheet_count=None):
+    """Client-side version of the fetch_unprocessed_pages RPC"""
+    query = supabase.table("new_pages_index")\
+        .select("*")\
+        .or_("rag_ingested.eq.false,rag_ingested.is.null")
+    if subcategory:
+        query = query.eq("subcategory", subcategory)
+    
+    # Get more pages than needed and shuffle to reduce conflicts between workers
+    pages = [page for page in query.limit(limit * 5).execute().data or [] if not page.get('processing_locked')]
+    random.shuffle(pages)
+    
+    if datasheet_count is not None and pages:
+        # One query for all candidate pages' datasheets instead of one count per page
+        datasheets = supabase.table("new_datasheets_index")\
+            .select("parent_url")\
+            .in_("parent_url", [page['url'] for page in pages])\
+            .execute().data or []
+        counts = Counter(row['parent_url'] for row in datasheets)
+        pages = [page for page in pages if counts[page['url']] == datasheet_count]
+    
+    return pages[:limit]
+
 async def lock_page_for_processing(page_id):
     """Attempt to lock a page for processing to avoid conflicts"""
     try:
@@ -123,7 +119,7 @@ async def process_batch(subcategory=None, datasheet_count=None, batch_size=10):
     
     # Get unprocessed pages
     pages = await get_unprocessed_pages(
-        limit=batch_size * 2,  # Get extra pages in case some are locked
+        limit=batch_size,  # RPC already excludes locked pages
         subcategory=subcategory,
         datasheet_count=datasheet_count
     )
@@ -147,24 +143,24 @@ async def process_batch(subcategory=None, datasheet_count=None, batch_size=10):
             continue
         
         try:
-            logger.info(f"[Worker {WORKER_ID}] Processing page {page['id']}: {page['url'][:50]}...")
+            logger.info("[Worker %s] Processing page %s: %.50s...", WORKER_ID, page['id'], page['url'])
             result = await process_page_enhance_alt_text(page['id'])
             
             results["processed"] += 1
             
             if result['success']:
                 results["success"] += 1
-                logger.info(f"[Worker {WORKER_ID}] ✅ Successfully processed page {page['id']}")
-                logger.info(f"[Worker {WORKER_ID}]    - Content length: {result.get('content_length', 0):,} chars")
-                logger.info(f"[Worker {WORKER_ID}]    - Images uploaded: {result.get('images_uploaded', 0)}")
-                logger.info(f"[Worker {WORKER_ID}]    - Datasheets: {result.get('datasheets_processed', 0)}")
+                logger.info("[Worker %s] ✅ Successfully processed page %s", WORKER_ID, page['id'])
+                logger.debug("[Worker %s]    - Content length: %d chars", WORKER_ID, result.get('content_length', 0))
+                logger.debug("[Worker %s]    - Images uploaded: %s", WORKER_ID, result.get('images_uploaded', 0))
+                logger.debug("[Worker %s]    - Datasheets: %s", WORKER_ID, result.get('datasheets_processed', 0))
             else:
                 results["failed"] += 1
-                logger.error(f"[Worker {WORKER_ID}] ❌ Failed to process page {page['id']}: {result.get('error')}")
+                logger.error("[Worker %s] ❌ Failed to process page %s: %s", WORKER_ID, page['id'], result.get('error'))
                 
         except Exception as e:
             results["failed"] += 1
-            logger.error(f"[Worker {WORKER_ID}] Error processing page {page['id']}: {e}")
+            logger.error("[Worker %s] Error processing page %s: %s", WORKER_ID, page['id'], e)
         finally:
             # Always unlock the page
             await unlock_page(page['id'])
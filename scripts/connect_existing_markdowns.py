@@ -6,9 +6,9 @@ with proper connections to the pages table
 """
 import os
 import sys
-import json
 import re
 import glob
+from itertools import chain
 from pathlib import Path
 from datetime import datetime
 
@@ -16,12 +16,33 @@ from datetime import datetime
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+try:
+    import orjson
+
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, default=str) + b"\n"
+
+    _loads_line = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps_line(obj) -> bytes:
+        return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+    _loads_line = json.loads
+
 from scripts.raganything_api_service import (
     get_supabase_client,
     logger,
     upload_processed_document_to_supabase
 )
 
+# Per-file results log, kept with the processing output rather than in the cwd
+RESULTS_PATH = project_root / "output" / "connect_markdowns_results.jsonl"
+
+# Page rows fetched this run; missing pages are not cached so a later lookup retries
+_page_rows = {}
+
 def extract_page_id_from_path(file_path: str) -> int:
     """Extract page ID from file path like knowledge_base/page_9067/..."""
     match = re.search(r'page_(\d+)', file_path)
@@ -29,44 +50,46 @@ def extract_page_id_from_path(file_path: str) -> int:
         return int(match.group(1))
     return None
 
-def find_existing_markdown_files() -> list:
-    """Find all existing processed markdown files"""
-    markdown_files = []
-    
-    # Pattern 1: knowledge_base/page_*/*/auto/*.md
-    pattern1 = "knowledge_base/page_*/*/auto/*.md"
-    files1 = glob.glob(pattern1, recursive=True)
-    
-    # Pattern 2: output/*/auto/*.md (recent processing)
-    pattern2 = "output/*/auto/*.md"
-    files2 = glob.glob(pattern2, recursive=True)
-    
-    # Pattern 3: scripts/knowledge_base/page_*/*/auto/*.md
-    pattern3 = "scripts/knowledge_base/page_*/*/auto/*.md"
-    files3 = glob.glob(pattern3, recursive=True)
-    
-    all_files = files1 + files2 + files3
+def find_existing_markdown_files():
+    """Yield existing processed markdown files one at a time"""
+    patterns = (
+        # Pattern 1: knowledge_base/page_*/*/auto/*.md
+        "knowledge_base/page_*/*/auto/*.md",
+        # Pattern 2: output/*/auto/*.md (recent processing)
+        "output/*/auto/*.md",
+        # Pattern 3: scripts/knowledge_base/page_*/*/auto/*.md
+        "scripts/knowledge_base/page_*/*/auto/*.md",
+    )
     
-    for file_path in all_files:
+    for file_path in chain.from_iterable(glob.iglob(p) for p in patterns):
         page_id = extract_page_id_from_path(file_path)
         if page_id:
-            markdown_files.append({
+            stat = os.stat(file_path)
+            yield {
                 "file_path": file_path,
                 "page_id": page_id,
-                "file_size": os.path.getsize(file_path),
-                "modified_time": datetime.fromtimestamp(os.path.getmtime(file_path))
-            })
-    
-    return markdown_files
+                "file_size": stat.st_size,
+                "modified_time": datetime.fromtimestamp(stat.st_mtime)
+            }
+
+def _fetch_page_row(page_id: int) -> dict:
+    """Fetch a page row once per run; rows are read-only for this script"""
+    if page_id in _page_rows:
+        return _page_rows[page_id]
+    supabase_client = get_supabase_client()
+    response = supabase_client.table("new_pages_index").select("*").eq("id", page_id).execute()
+    if not response.data:
+        return None
+    _page_rows[page_id] = response.data[0]
+    return _page_rows[page_id]
 
 def get_page_data_from_db(page_id: int) -> dict:
     """Get page data from new_pages_index table"""
     try:
-        supabase_client = get_supabase_client()
-        response = supabase_client.table("new_pages_index").select("*").eq("id", page_id).execute()
+        page_data = _fetch_page_row(page_id)
         
-        if response.data:
-            return response.data[0]
+        if page_data:
+            return page_data
         else:
             logger.warning(f"Page {page_id} not found in database")
             return None
@@ -113,7 +136,7 @@ async def connect_markdown_to_page(file_info: dict) -> dict:
         page_id = file_info['page_id']
         file_path = file_info['file_path']
         
-        logger.info(f"Processing markdown for page {page_id}: {file_path}")
+        logger.debug("Processing markdown for page %s: %s", page_id, file_path)
         
         # Get page data from database
         page_data = get_page_data_from_db(page_id)
@@ -163,7 +186,7 @@ async def connect_markdown_to_page(file_info: dict) -> dict:
                 }
                 
                 supabase_client.table("new_pages_index").update(update_data).eq("id", page_id).execute()
-                logger.info(f"Updated page {page_id} status to completed")
+                logger.debug("Updated page %s status to completed", page_id)
             
             return {
                 "success": True,
@@ -179,33 +202,46 @@ async def connect_markdown_to_page(file_info: dict) -> dict:
         logger.error(f"Error connecting markdown for page {page_id}: {e}")
         return {"success": False, "error": str(e)}
 
-async def connect_all_existing_markdowns():
-    """Main function to connect all existing markdown files"""
+def _iter_results(results_path: str):
+    """Stream per-file results back from the JSONL log"""
+    with open(results_path, "rb") as results_file:
+        for line in results_file:
+            yield _loads_line(line)
+
+async def connect_all_existing_markdowns(results_path: str = None):
+    """Main function to connect all existing markdown files
+    
+    Per-file results are streamed to results_path (JSONL, by default
+    output/connect_markdowns_results.jsonl) while files are processed; the
+    returned dict carries only the counters and the log path.
+    """
     logger.info("🔗 Starting retroactive markdown connection process...")
     
-    # Find all existing markdown files
-    markdown_files = find_existing_markdown_files()
-    logger.info(f"Found {len(markdown_files)} existing markdown files")
+    results_path = Path(results_path or RESULTS_PATH)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
     
     results = {
-        "total_files": len(markdown_files),
+        "total_files": 0,
         "successful": 0,
         "failed": 0,
-        "details": []
+        "results_file": str(results_path)
     }
     
-    for i, file_info in enumerate(markdown_files, 1):
-        logger.info(f"Processing {i}/{len(markdown_files)}: Page {file_info['page_id']}")
-        
-        result = await connect_markdown_to_page(file_info)
-        results["details"].append(result)
-        
-        if result["success"]:
-            results["successful"] += 1
-            logger.info(f"✅ Successfully connected page {result['page_id']}")
-        else:
-            results["failed"] += 1
-            logger.error(f"❌ Failed to connect page {file_info['page_id']}: {result['error']}")
+    with open(results_path, "wb") as results_file:
+        for i, file_info in enumerate(find_existing_markdown_files(), 1):
+            logger.debug("Processing %d: Page %s", i, file_info['page_id'])
+            
+            result = await connect_markdown_to_page(file_info)
+            result.setdefault("page_id", file_info['page_id'])
+            results_file.write(_dumps_line(result))
+            results["total_files"] += 1
+            
+            if result["success"]:
+                results["successful"] += 1
+                logger.info("✅ Successfully connected page %s", result['page_id'])
+            else:
+                results["failed"] += 1
+                logger.error("❌ Failed to connect page %s: %s", file_info['page_id'], result['error'])
     
     # Summary
     logger.info("=" * 50)
@@ -217,13 +253,13 @@ async def connect_all_existing_markdowns():
     
     if results["successful"] > 0:
         logger.info("\n✅ Successfully connected pages:")
-        for detail in results["details"]:
+        for detail in _iter_results(results_path):
             if detail["success"]:
                 logger.info(f"  Page {detail['page_id']}: {detail['doc_url']}")
     
     if results["failed"] > 0:
         logger.info("\n❌ Failed connections:")
-        for detail in results["details"]:
+        for detail in _iter_results(results_path):
             if not detail["success"]:
                 logger.info(f"  Page {detail.get('page_id', 'unknown')}: {detail['error']}")
     
@@ -1,9 +1,22 @@
 import asyncio
 import json
 import logging
+import mmap
 import os
+import sys
+from collections import Counter
 from pathlib import Path
 
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Load environment variables
 try:
     from dotenv import load_dotenv
@@ -15,12 +28,12 @@ except ImportError:
 # RAGAnything imports
 try:
     from raganything import RAGAnything
-    from lightrag.llm.openai import openai_complete_if_cache, openai_embed
     from lightrag import LightRAG
+    from scripts.rag_openai import make_embedding_func, make_llm_func
     RAG_ANYTHING_AVAILABLE = True
-except ImportError:
+except ImportError as e:
     RAG_ANYTHING_AVAILABLE = False
-    print("⚠️ RAGAnything not available - install with: pip install raganything")
+    print(f"⚠️ RAGAnything not available ({e}) - install with: pip install raganything")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,31 +56,20 @@ async def demo_knowledge_graph():
         print("❌ OPENAI_API_KEY not found in environment")
         return
     
+    embedding_func = None
     try:
         # Initialize RAGAnything
         print("🔧 Initializing RAG-Anything...")
         
-        def embedding_func(texts):
-            return openai_embed(
-                texts,
-                model="text-embedding-3-large", 
-                api_key=openai_api_key,
-            )
-        embedding_func.embedding_dim = 3072
-        
         working_dir = "./rag_storage"
         Path(working_dir).mkdir(exist_ok=True)
         
+        # Cached, batched embedding function (exposes embedding_dim for LightRAG)
+        embedding_func = make_embedding_func(openai_api_key, cache_dir=working_dir)
+        
         lightrag_instance = LightRAG(
             working_dir=working_dir,
-            llm_model_func=lambda prompt, system_prompt=None, history_messages=[], **kwargs: openai_complete_if_cache(
-                "gpt-4o-mini",
-                prompt,
-                system_prompt=system_prompt,
-                history_messages=history_messages,
-                api_key=openai_api_key,
-                **kwargs,
-            ),
+            llm_model_func=make_llm_func(openai_api_key),
             embedding_func=embedding_func
         )
         
@@ -79,56 +81,63 @@ async def demo_knowledge_graph():
         print("-" * 40)
         
         # Check vector database files
-        vdb_files = list(Path(working_dir).glob("*.json"))
-        print(f"Vector files: {len(vdb_files)}")
-        for f in vdb_files:
-            size = f.stat().st_size
-            print(f"  📄 {f.name}: {size} bytes")
-        
-        # Check processed content
+        # scandir entries carry cached stat data, so sizes are read once and reused below
+        with os.scandir(working_dir) as entries:
+            vdb_entries = [(e.name, e.stat().st_size) for e in entries
+                           if e.name.endswith(".json") and e.is_file()]
+        print(f"Vector files: {len(vdb_entries)}")
+        for name, size in vdb_entries:
+            print(f"  📄 {name}: {size} bytes")
+        
+        # Check processed content (one walk classifies content lists and markdown)
         processed_dir = Path("rag_output")
-        if processed_dir.exists():
-            content_files = list(processed_dir.rglob("*_content_list.json"))
-            if content_files:
-                with open(content_files[0], 'r', encoding='utf-8') as f:
-                    content_list = json.load(f)
-                    print(f"Content items: {len(content_list)}")
-                    
-                    # Count content types
-                    text_count = sum(1 for item in content_list if item.get("type") == "text")
-                    image_count = sum(1 for item in content_list if item.get("type") == "image")
-                    table_count = sum(1 for item in content_list if item.get("type") == "table")
-                    
-                    print(f"  📝 Text blocks: {text_count}")
-                    print(f"  🖼️ Images: {image_count}")
-                    print(f"  📋 Tables: {table_count}")
+        content_files, md_files = [], []
+        for dirpath, _, filenames in os.walk(processed_dir):
+            for filename in filenames:
+                if filename.endswith("_content_list.json"):
+                    content_files.append(Path(dirpath) / filename)
+                elif filename.endswith(".md"):
+                    md_files.append(Path(dirpath) / filename)
+        
+        if content_files:
+            # Stream items so large content lists are never fully loaded
+            with open(content_files[0], 'rb') as f:
+                items = ijson.items(f, "item") if IJSON_AVAILABLE else json.load(f)
+                counts = Counter(item.get("type") for item in items)
+            
+            print(f"Content items: {sum(counts.values())}")
+            print(f"  📝 Text blocks: {counts.get('text', 0)}")
+            print(f"  🖼️ Images: {counts.get('image', 0)}")
+            print(f"  📋 Tables: {counts.get('table', 0)}")
         
         # Demonstrate content analysis
         print("\n🔍 CONTENT ANALYSIS:")
         print("-" * 40)
         
         # Look for processed markdown
-        md_files = list(processed_dir.rglob("*.md"))
         if md_files:
             print(f"📄 Markdown files: {len(md_files)}")
-            with open(md_files[0], 'r', encoding='utf-8') as f:
-                content = f.read()
-                print(f"  Content length: {len(content)} characters")
+            with open(md_files[0], 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                print(f"  Content size: {size} bytes")
                 
-                # Extract key information
-                if "PT1 series" in content:
-                    print("  🎯 Found: PT1 Draw-wire Sensors")
-                if "TECHNICAL DATASHEETS" in content:
-                    print("  📋 Found: Technical datasheets")
-                if "Key features" in content:
-                    print("  ✨ Found: Key features section")
+                # Extract key information (mmap.find scans in C without reading the file into memory)
+                if size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if mm.find(b"PT1 series") >= 0:
+                            print("  🎯 Found: PT1 Draw-wire Sensors")
+                        if mm.find(b"TECHNICAL DATASHEETS") >= 0:
+                            print("  📋 Found: Technical datasheets")
+                        if mm.find(b"Key features") >= 0:
+                            print("  ✨ Found: Key features section")
         
         # Demonstrate simple query capability
         print("\n🤖 KNOWLEDGE GRAPH QUERIES:")
         print("-" * 40)
         
         # Add some content if knowledge graph is empty
-        if not vdb_files or all(f.stat().st_size == 0 for f in vdb_files):
+        needs_ingest = not vdb_entries or all(size == 0 for _, size in vdb_entries)
+        if needs_ingest:
             print("📚 Adding content to knowledge graph...")
             
             # Use the processed content
@@ -147,13 +156,25 @@ async def demo_knowledge_graph():
             "What technical datasheets are available?"
         ]
         
-        for query in test_queries:
-            try:
-                print(f"\n❓ Query: {query}")
-                result = await lightrag_instance.aquery(query, param="hybrid")
+        # Queries are independent, so run them concurrently (bounded for rate limits)
+        query_semaphore = asyncio.Semaphore(5)
+        
+        async def run_query(query):
+            async with query_semaphore:
+                try:
+                    return query, await lightrag_instance.aquery(query, param="hybrid"), None
+                except Exception as e:
+                    return query, None, e
+        
+        results = await asyncio.gather(*[run_query(q) for q in test_queries])
+        for query, result, error in results:
+            print(f"\n❓ Query: {query}")
+            if error is not None:
+                print(f"❌ Query failed: {error}")
+            else:
                 print(f"💡 Answer: {result[:200]}..." if len(result) > 200 else f"💡 Answer: {result}")
-            except Exception as e:
-                print(f"❌ Query failed: {e}")
+        
+        print(f"\n📦 Embedding cache: {embedding_func.cache_stats()}")
         
         # Demonstrate multimodal capabilities
         print("\n🎨 MULTIMODAL CAPABILITIES:")
@@ -180,6 +201,9 @@ async def demo_knowledge_graph():
         logger.error(f"❌ Demo failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if embedding_func is not None:
+            await embedding_func.close()
 
 if __name__ == "__main__":
     asyncio.run(demo_knowledge_graph())
\ No newline at end of file
@@ -1,14 +1,36 @@
 import asyncio
+import hashlib
+import importlib.util
 import json
 import logging
 import os
-import base64
+import sys
 import tempfile
+from collections import defaultdict
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from supabase import create_client, Client
-import requests
-from bs4 import BeautifulSoup
+
+try:
+    from pybloom_live import ScalableBloomFilter
+    BLOOM_AVAILABLE = True
+except ImportError:
+    BLOOM_AVAILABLE = False
+
+# Ingested documents recorded in memory before the index files are rewritten
+INGESTED_FLUSH_EVERY = 20
+
+# Tags whose text never belongs in scraped page content
+NON_CONTENT_TAGS = ["script", "style", "noscript", "svg", "iframe"]
+
+# BeautifulSoup backend for the fallback parser (checked without importing lxml)
+BS4_PARSER = 'lxml' if importlib.util.find_spec("lxml") else 'html.parser'
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
 
 # Load environment variables
 try:
@@ -20,44 +42,163 @@ except ImportError:
 except Exception as e:
     print(f"[ERROR] Error loading .env: {e}")
 
-# RAGAnything imports
-try:
-    from raganything import RAGAnything
-    from lightrag.llm.openai import openai_complete_if_cache, openai_embed
-    from lightrag import LightRAG
-    RAG_ANYTHING_AVAILABLE = True
-except ImportError:
-    RAG_ANYTHING_AVAILABLE = False
-    print("[WARNING] RAGAnything not available - install with: pip install raganything")
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _write_atomically(path, write):
+    """Write a file through a temp file in the same directory and os.replace, so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 class EnhancedRAGService:
     def __init__(self):
-        # Supabase setup
+        # Supabase setup; credentials are only required once the client is used
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_key = os.getenv("SUPABASE_ANON_KEY")
         
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("[ERROR] SUPABASE_URL and SUPABASE_ANON_KEY environment variables are required")
-        
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
+        # Supabase client is created on first use (see the supabase property)
+        self._supabase = None
         
         # OpenAI setup for RAGAnything
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         
-        # RAGAnything setup
+        # RAGAnything setup (built once per service, see initialize_rag_anything)
         self.rag_anything = None
+        self._embedding_func = None
         self.working_dir = os.getenv("WORKING_DIR", "./rag_storage")
         Path(self.working_dir).mkdir(exist_ok=True)
+        
+        # Shared HTTP session (created lazily inside the running event loop)
+        self._session = None
+        self._download_semaphore = None
+        
+        # Content hashes of documents already ingested into RAGAnything
+        self._bloom_path = os.path.join(self.working_dir, "ingested.bloom")
+        self._seen_path = os.path.join(self.working_dir, "ingested_hashes.json")
+        self._bloom, self._seen_dict = self._load_ingested_index()
+        self._unflushed = 0  # documents marked since the index was last written
             
         logger.info("[OK] Enhanced RAG Service initialized")
     
+    def _load_ingested_index(self):
+        """Load the bloom filter and hash -> file sidecar used to skip re-ingestion"""
+        seen = {}
+        if os.path.exists(self._seen_path):
+            try:
+                with open(self._seen_path, 'r', encoding='utf-8') as f:
+                    seen = json.load(f)
+            except Exception as e:
+                logger.warning(f"[WARNING] Could not read {self._seen_path}: {e}")
+        
+        if not BLOOM_AVAILABLE:
+            # The sidecar dict alone gives exact (if slightly slower) membership checks
+            return None, seen
+        
+        if os.path.exists(self._bloom_path):
+            try:
+                with open(self._bloom_path, 'rb') as f:
+                    return ScalableBloomFilter.fromfile(f), seen
+            except Exception as e:
+                logger.warning(f"[WARNING] Could not read {self._bloom_path}: {e}")
+        
+        bloom = ScalableBloomFilter(initial_capacity=10_000, error_rate=1e-4)
+        for content_hash in seen:
+            bloom.add(content_hash)
+        return bloom, seen
+    
+    def _is_ingested(self, content_hash):
+        if self._bloom is not None and content_hash not in self._bloom:
+            return False
+        return content_hash in self._seen_dict
+    
+    def _mark_ingested(self, content_hash, processed_file):
+        """Record a processed document; the index is written every INGESTED_FLUSH_EVERY documents and on close"""
+        self._seen_dict[content_hash] = processed_file
+        if self._bloom is not None:
+            self._bloom.add(content_hash)
+        
+        self._unflushed += 1
+        if self._unflushed >= INGESTED_FLUSH_EVERY:
+            self._flush_ingested_index()
+    
+    def _flush_ingested_index(self):
+        """Write the hash sidecar and bloom filter if documents were marked since the last write"""
+        if not self._unflushed:
+            return
+        try:
+            _write_atomically(self._seen_path, lambda f: f.write(json.dumps(self._seen_dict).encode('utf-8')))
+            if self._bloom is not None:
+                _write_atomically(self._bloom_path, self._bloom.tofile)
+            self._unflushed = 0
+        except OSError as e:
+            logger.warning(f"[WARNING] Could not write the ingested index: {e}")
+    
+    @property
+    def supabase(self):
+        """Supabase client, imported and created lazily so query-only runs skip it"""
+        if self._supabase is None:
+            if not self.supabase_url or not self.supabase_key:
+                raise ValueError("[ERROR] SUPABASE_URL and SUPABASE_ANON_KEY environment variables are required")
+            from supabase import create_client
+            self._supabase = create_client(self.supabase_url, self.supabase_key)
+        return self._supabase
+    
+    def _get_session(self):
+        """Return the shared aiohttp session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            import aiohttp  # deferred so query-only runs don't pay for it
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30),
+                connector=aiohttp.TCPConnector(
+                    limit=32,
+                    limit_per_host=16,
+                    keepalive_timeout=30,  # reuse TCP/TLS connections across downloads
+                    ttl_dns_cache=300
+                )
+            )
+            self._download_semaphore = asyncio.Semaphore(8)
+        return self._session
+    
+    async def close(self):
+        """Write the ingested index and close the shared HTTP session and the embedding batcher"""
+        self._flush_ingested_index()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._embedding_func is not None:
+            await self._embedding_func.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
     def initialize_rag_anything(self):
-        """Initialize RAGAnything with OpenAI functions"""
-        if not RAG_ANYTHING_AVAILABLE:
-            logger.error("[ERROR] RAGAnything not installed")
+        """Initialize RAGAnything with OpenAI functions (no-op if already initialized)"""
+        if self.rag_anything is not None:
+            return True
+        
+        # Heavy imports are deferred until RAGAnything is actually needed
+        try:
+            from raganything import RAGAnything
+            from lightrag import LightRAG
+            from scripts.rag_openai import make_embedding_func, make_llm_func
+        except ImportError as e:
+            logger.error(f"[ERROR] RAGAnything not available ({e}) - install with: pip install raganything")
             return False
             
         if not self.openai_api_key:
@@ -65,26 +206,16 @@ class EnhancedRAGService:
             return False
         
         try:
-            # Create embedding function with embedding_dim attribute
-            def embedding_func(texts):
-                return openai_embed(
-                    texts,
-                    model="text-embedding-3-large", 
-                    api_key=self.openai_api_key,
-                )
-            embedding_func.embedding_dim = 3072
+            # Create cached, batched embedding function with embedding_dim attribute
+            # (kept on the service so batcher/cache state survives re-initialization)
+            if self._embedding_func is None:
+                self._embedding_func = make_embedding_func(self.openai_api_key, cache_dir=self.working_dir)
+            embedding_func = self._embedding_func
             
             # First create LightRAG instance
             lightrag_instance = LightRAG(
                 working_dir=self.working_dir,
-                llm_model_func=lambda prompt, system_prompt=None, history_messages=[], **kwargs: openai_complete_if_cache(
-                    "gpt-4o-mini",
-                    prompt,
-                    system_prompt=system_prompt,
-                    history_messages=history_messages,
-                    api_key=self.openai_api_key,
-                    **kwargs,
-                ),
+                llm_model_func=make_llm_func(self.openai_api_key),
                 embedding_func=embedding_func
             )
             
@@ -104,20 +235,31 @@ class EnhancedRAGService:
             logger.info("[SEARCH] Looking for unprocessed pages with datasheets...")
             
             # Get unprocessed pages
-            pages_response = self.supabase.table("new_pages_index").select("*").eq("ingested", False).limit(20).execute()
+            pages_response = await asyncio.to_thread(
+                lambda: self.supabase.table("new_pages_index").select("*").eq("ingested", False).limit(20).execute()
+            )
             logger.info(f"[PAGES] Found {len(pages_response.data)} unprocessed pages")
             
+            # Fetch datasheets for all pages in one query and group by parent URL
+            urls = [page["url"] for page in pages_response.data]
+            datasheets_by_url = defaultdict(list)
+            if urls:
+                datasheets_response = await asyncio.to_thread(
+                    lambda: self.supabase.table("new_datasheets_index").select("*").in_("parent_url", urls).execute()
+                )
+                for datasheet in datasheets_response.data:
+                    datasheets_by_url[datasheet["parent_url"]].append(datasheet)
+            
             pages_with_datasheets = []
             for page in pages_response.data:
-                # Check for datasheets for this page
-                datasheets_response = self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page["url"]).limit(5).execute()
-                if datasheets_response.data:
-                    page["datasheets"] = datasheets_response.data
+                datasheets = datasheets_by_url[page["url"]][:5]
+                if datasheets:
+                    page["datasheets"] = datasheets
                     pages_with_datasheets.append({
                         "page": page,
-                        "datasheet_count": len(datasheets_response.data)
+                        "datasheet_count": len(datasheets)
                     })
-                    logger.info(f"[OK] Page {page['id']} has {len(datasheets_response.data)} datasheets")
+                    logger.info(f"[OK] Page {page['id']} has {len(datasheets)} datasheets")
             
             # Sort by datasheet count and limit
             pages_with_datasheets.sort(key=lambda x: x["datasheet_count"], reverse=True)
@@ -129,25 +271,51 @@ class EnhancedRAGService:
             traceback.print_exc()
             return []
     
-    async def scrape_page_content(self, url):
-        """Scrape web page content"""
+    @staticmethod
+    def _parse_page_html(html, max_chars=None):
+        """Extract title and cleaned text from page HTML (runs in a worker thread)
+        
+        When max_chars is set, the raw text is cut (with a margin for whitespace
+        compaction) before cleaning so the full page text is never copied.
+        """
+        if SELECTOLAX_AVAILABLE:
+            tree = HTMLParser(html)
+            for tag in tree.css(", ".join(NON_CONTENT_TAGS)):
+                tag.decompose()
+            
+            title_node = tree.css_first("title")
+            title = title_node.text() if title_node else "Untitled"
+            text = tree.body.text(separator=" ") if tree.body else ""
+            if max_chars is not None:
+                return title, " ".join(text[:max_chars * 4].split())[:max_chars]
+            return title, " ".join(text.split())
+        
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, BS4_PARSER)
+        for tag in soup.find_all(NON_CONTENT_TAGS):
+            tag.extract()
+        
+        title = (soup.title.string or "Untitled") if soup.title else "Untitled"
+        
+        # Single get_text pass, then collapse whitespace runs in one C-level split/join
+        text = soup.get_text(separator=" ")
+        if max_chars is not None:
+            clean_text = " ".join(text[:max_chars * 4].split())[:max_chars]
+        else:
+            clean_text = " ".join(text.split())
+        
+        return title, clean_text
+    
+    async def scrape_page_content(self, url, max_chars=3000):
+        """Scrape web page content, keeping at most max_chars characters of text"""
         try:
             logger.info(f"Scraping page: {url}")
             
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            async with self._get_session().get(url) as response:
+                response.raise_for_status()
+                html = await response.read()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            title = soup.title.string if soup.title else "Untitled"
-            text = soup.get_text()
-            
-            # Clean text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            clean_text = ' '.join(chunk for chunk in chunks if chunk)
+            title, clean_text = await asyncio.to_thread(self._parse_page_html, html, max_chars)
             
             return {
                 "title": title,
@@ -160,33 +328,32 @@ class EnhancedRAGService:
             return None
     
     async def download_datasheet(self, datasheet_url):
-        """Download and convert PDF datasheet to text"""
+        """Stream a PDF datasheet to a temporary file and return its path and size"""
+        temp_path = None
         try:
-            logger.info(f"[DOWNLOAD] Downloading datasheet: {datasheet_url}")
-            
-            response = requests.get(datasheet_url, timeout=30)
-            response.raise_for_status()
-            
-            # Save to temp file and convert to base64
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(response.content)
-                temp_path = temp_file.name
-            
-            # Convert to base64 for storage
-            with open(temp_path, 'rb') as f:
-                base64_content = base64.b64encode(f.read()).decode('utf-8')
-            
-            # Clean up
-            os.unlink(temp_path)
+            session = self._get_session()
+            async with self._download_semaphore:
+                logger.info(f"[DOWNLOAD] Downloading datasheet: {datasheet_url}")
+                
+                async with session.get(datasheet_url) as response:
+                    response.raise_for_status()
+                    size = 0
+                    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+                        temp_path = temp_file.name
+                        async for chunk in response.content.iter_chunked(1 << 20):
+                            temp_file.write(chunk)
+                            size += len(chunk)
             
             return {
                 "url": datasheet_url,
-                "base64_content": base64_content,
-                "size": len(base64_content)
+                "size": size,
+                "path": temp_path
             }
             
         except Exception as e:
             logger.error(f"[ERROR] Error downloading datasheet {datasheet_url}: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
             return None
     
     async def merge_content_for_rag(self, page_content, datasheets_data, page_record):
@@ -201,7 +368,7 @@ class EnhancedRAGService:
                     "business_area": page_record["business_area"],
                     "page_type": page_record["page_type"]
                 },
-                "web_content": page_content["content"][:3000],  # Limit for initial testing
+                "web_content": page_content["content"],  # Already capped by scrape_page_content
                 "datasheets": [],
                 "summary": f"Product information for {page_content['title']} with {len(datasheets_data)} technical datasheets"
             }
@@ -229,7 +396,7 @@ class EnhancedRAGService:
         
         try:
             # Create a temporary text file with merged content
-            content_text = f"""
+            parts = [f"""
 PRODUCT: {merged_content['page_info']['title']}
 BUSINESS AREA: {merged_content['page_info']['business_area']}
 URL: {merged_content['page_info']['url']}
@@ -238,12 +405,16 @@ WEB CONTENT:
 {merged_content['web_content']}
 
 TECHNICAL DATASHEETS:
-"""
+"""]
+            parts.extend(f"- {ds['url']} ({ds['size']} bytes, {ds['type']})\n" for ds in merged_content['datasheets'])
+            parts.append(f"\nSUMMARY: {merged_content['summary']}")
+            content_text = "".join(parts)
             
-            for ds in merged_content['datasheets']:
-                content_text += f"- {ds['url']} ({ds['size']} bytes, {ds['type']})\n"
-            
-            content_text += f"\nSUMMARY: {merged_content['summary']}"
+            # Skip documents whose exact content was already ingested
+            content_hash = hashlib.sha256(content_text.encode('utf-8')).hexdigest()
+            if self._is_ingested(content_hash):
+                logger.info(f"[SKIP] Content already ingested ({content_hash[:12]}), skipping RAGAnything processing")
+                return self._seen_dict[content_hash]
             
             # Save to temporary file
             temp_file = os.path.join(output_dir, f"merged_content_{merged_content['page_info']['id']}.txt")
@@ -261,6 +432,7 @@ TECHNICAL DATASHEETS:
             )
             
             logger.info("[OK] RAGAnything processing complete")
+            self._mark_ingested(content_hash, temp_file)
             return temp_file
             
         except Exception as e:
@@ -306,16 +478,22 @@ TECHNICAL DATASHEETS:
             if not page_content:
                 return {"error": "Failed to scrape page content"}
             
-            # Download first few datasheets
+            # Download first few datasheets concurrently
             datasheets = page_record.get("datasheets", [])[:2]  # Limit for testing
-            datasheets_data = []
-            
-            for ds in datasheets:
-                ds_data = await self.download_datasheet(ds["url"])
-                datasheets_data.append(ds_data)
+            results = await asyncio.gather(
+                *[self.download_datasheet(ds["url"]) for ds in datasheets],
+                return_exceptions=True
+            )
+            datasheets_data = [None if isinstance(r, Exception) else r for r in results]
             
             # Merge content
             merged_content = await self.merge_content_for_rag(page_content, datasheets_data, page_record)
+            
+            # Downloaded PDFs are only needed for their metadata at this point
+            for ds in datasheets_data:
+                if ds and os.path.exists(ds["path"]):
+                    os.unlink(ds["path"])
+            
             if not merged_content:
                 return {"error": "Failed to merge content"}
             
@@ -327,6 +505,14 @@ TECHNICAL DATASHEETS:
             if not processed_file:
                 return {"error": "Failed to process with RAGAnything"}
             
+            # Mark the page as ingested so it is not picked up again
+            try:
+                await asyncio.to_thread(
+                    lambda: self.supabase.table("new_pages_index").update({"ingested": True}).eq("id", page_record["id"]).execute()
+                )
+            except Exception as e:
+                logger.warning(f"[WARNING] Could not mark page {page_record['id']} as ingested: {e}")
+            
             # Test query
             query_result = await self.query_knowledge_graph(
                 "What are the key features and specifications of this product?"
@@ -347,6 +533,11 @@ TECHNICAL DATASHEETS:
             logger.error(f"[ERROR] Error in complete example: {e}")
             return {"error": str(e)}
 
+@lru_cache(maxsize=1)
+def get_service():
+    """Return a process-wide EnhancedRAGService so callers share one RAG instance"""
+    return EnhancedRAGService()
+
 async def main():
     import argparse
     
@@ -366,21 +557,20 @@ async def main():
         return 0
     
     try:
-        service = EnhancedRAGService()
-        
-        if args.command == 'complete':
-            print("[START] Running complete RAG pipeline...")
-            result = await service.process_complete_example()
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            
-        elif args.command == 'query':
-            if not service.initialize_rag_anything():
-                print("[ERROR] Failed to initialize RAGAnything")
-                return 1
-            
-            result = await service.query_knowledge_graph(args.question, args.mode)
-            print(f"Query: {args.question}")
-            print(f"Result: {result}")
+        async with get_service() as service:
+            if args.command == 'complete':
+                print("[START] Running complete RAG pipeline...")
+                result = await service.process_complete_example()
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+                
+            elif args.command == 'query':
+                if not service.initialize_rag_anything():
+                    print("[ERROR] Failed to initialize RAGAnything")
+                    return 1
+                
+                result = await service.query_knowledge_graph(args.question, args.mode)
+                print(f"Query: {args.question}")
+                print(f"Result: {result}")
         
         return 0
         
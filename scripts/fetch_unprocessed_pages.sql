@@ -0,0 +1,31 @@
+-- RPC used by scripts/batch_process_pages_parallel.py to fetch unprocessed pages
+-- The datasheet-count filter runs in Postgres so workers get exactly the pages they need.
+-- Rows come back in random order so parallel workers pick different pages; the
+-- optimistic processing_locked update in the worker settles any remaining overlap.
+
+CREATE OR REPLACE FUNCTION fetch_unprocessed_pages(
+    p_limit INT,
+    p_datasheet_count INT DEFAULT NULL,
+    p_subcategory TEXT DEFAULT NULL
+)
+RETURNS SETOF new_pages_index
+LANGUAGE sql
+VOLATILE
+AS $$
+    SELECT p.*
+    FROM new_pages_index p
+    LEFT JOIN (
+        SELECT parent_url, COUNT(*) AS c
+        FROM new_datasheets_index
+        GROUP BY parent_url
+    ) d ON d.parent_url = p.url
+    WHERE (p.rag_ingested IS NOT TRUE)
+      AND (p_datasheet_count IS NULL OR COALESCE(d.c, 0) = p_datasheet_count)
+      AND (p_subcategory IS NULL OR p.subcategory = p_subcategory)
+      AND (p.processing_locked IS NOT TRUE)
+    ORDER BY random()
+    LIMIT p_limit;
+$$;
+
+-- Example usage (not run as part of the migration):
+-- SELECT id, url, subcategory FROM fetch_unprocessed_pages(10, 1, NULL);
@@ -3,17 +3,60 @@ import json
 import logging
 import os
 import base64
+import contextlib
 import tempfile
-import requests
-import gc
+import aiohttp
+import hashlib
+import mmap
+import importlib.util
+import shutil
+import threading
 import time
+import shlex
 import subprocess
 import uuid
 import mimetypes
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from supabase import create_client, Client
-from bs4 import BeautifulSoup
+
+from async_utils import AdaptiveLimiter, MicroBatcher, backoff_delay
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+    from bs4 import BeautifulSoup
+
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+# Fallback PDF text extractors, used when MinerU produces no output
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+# BeautifulSoup fallback parser: lxml's C tokenizer when installed
+BS4_PARSER = 'lxml' if importlib.util.find_spec("lxml") else 'html.parser'
 
 # Load environment variables
 try:
@@ -23,21 +66,420 @@ try:
 except ImportError:
     print("[WARNING] python-dotenv not installed")
 
-# MinerU imports for PDF processing
+# MinerU runs as a CLI subprocess (see _MINERU_BASE_CMD); subprocess is imported above
+MINERU_AVAILABLE = True
+print("[OK] MinerU available for PDF processing")
+
 try:
-    import subprocess
-    MINERU_AVAILABLE = True
-    print("[OK] MinerU available for PDF processing")
+    import orjson
+
+    def _load_json(path):
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+
+    def _dumps_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode('utf-8')
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str).decode('utf-8')
+
+    _json_loads = orjson.loads
 except ImportError:
-    MINERU_AVAILABLE = False
-    print("[WARNING] MinerU not available")
+    def _load_json(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _dumps_pretty(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+
+    def _json_dumps(obj):
+        return json.dumps(obj, default=str)
+
+    _json_loads = json.loads
+
+
+def _read_text(path, errors='strict'):
+    """Read a UTF-8 file through mmap, decoding straight from the mapping without a bytes copy"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, 'utf-8', errors)
+
+def _link_or_copy(src, dst):
+    """Hardlink src to dst, copying when linking is not possible (e.g. across filesystems)"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# In-flight requests to the LightRAG server: start at the initial limit and adapt (AIMD) up to the max
+LIGHTRAG_MAX_CONCURRENCY = 16
+LIGHTRAG_INITIAL_CONCURRENCY = 4
+AIMD_WINDOW = 10  # seconds between limit adjustments
+AIMD_DECREASE_RATE = 0.05  # halve the limit when more than this share of requests was throttled
+AIMD_INCREASE_RATE = 0.01  # add one permit when fewer than this share was throttled
+HEALTH_CHECK_TIMEOUT = 2  # seconds
+SERVER_CHECK_TTL = 60  # seconds a successful connection check is reused by ingest entry points
+
+# Image uploads to Supabase Storage
+IMAGE_EXT_SET = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'})
+IMAGE_UPLOAD_WORKERS = 16
+IMAGE_URL_CACHE_SIZE = 4096  # Public URLs of uploaded images kept in memory, keyed by content digest
+
+# External fetches (product pages and datasheet PDFs)
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.3  # seconds, doubled per retry
+FETCH_RETRY_STATUSES = frozenset({502, 503, 504})
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+PAGE_CONCURRENCY = 4  # Pages ingested at once by bulk_ingest_to_lightrag
+PAGE_UPDATE_FLUSH_SIZE = 4  # Ingested pages marked in Supabase per batched flush
+DATASHEET_CONCURRENCY = 4  # Datasheets downloaded and extracted at once per page (MAX_CONCURRENT_DATASHEETS)
+PAGE_CACHE_SIZE = 256  # Scraped pages kept in memory, revalidated with ETag/Last-Modified
+PIPELINE_QUEUE_SIZE = 4  # Downloaded PDFs waiting for a MinerU start
+UPLOAD_CONCURRENCY = 8  # Finished MinerU processes uploaded to LightRAG at once (also the background uploader count)
+UPLOAD_QUEUE_SIZE = 16  # Finished processes waiting for a background uploader
+
+# LightRAG inserts and Supabase writes: jittered exponential backoff on 429/5xx
+WRITE_RETRIES = 5
+WRITE_BACKOFF = 0.5  # seconds, upper bound doubled per retry
+WRITE_BACKOFF_MAX = 30  # seconds
+WRITE_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+PAGE_ROW_CACHE_SIZE = 1024  # Supabase page/datasheet rows kept in memory
+PAGE_ROW_TTL = 60  # seconds
+INSERT_DEDUP_SIZE = 4096  # Digests of text bodies already uploaded this run
+INSERT_DEDUP_TTL = 3600  # seconds
+UPLOAD_SPOOL_SIZE = 4 << 20  # Streamed text bodies larger than this spill to a temp file
+
+# MinerU subprocess limits; each CPU run is memory hungry, so use at most half the cores
+MINERU_TIMEOUT = 1200  # 20 minutes for comprehensive multimodal extraction
+MINERU_MAX_PARALLEL = max(1, (os.cpu_count() or 2) // 2)
+MINERU_LOG_TAIL = 4096  # bytes of the stderr log surfaced on failure
+# PDFs requested close together share one `mineru -p <dir>` run, so models load once per batch
+MINERU_BATCH_MAX = 8  # PDFs per MinerU run
+MINERU_BATCH_MS = 1000  # wait this long after the first PDF for others to join its run
+
+# MinerU results are cached under WORKING_DIR/mineru_cache/<digest>-<mode>
+MINERU_CACHE_DIRNAME = "mineru_cache"
+# Datasheet doc_ids already ingested are recorded under WORKING_DIR/ingested_docs/<doc_id>.json
+INGESTED_DIRNAME = "ingested_docs"
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Parsed MinerU tables kept in memory, keyed by their HTML
+TABLE_TEXT_CACHE_SIZE = 1024
+
+OVERVIEW_SUMMARY_CHARS = 2000  # Web content budget in the page overview
+
+
+def _emit_table(parts, item, idx):
+    parts.append(f"\n[TABLE {idx+1}]: {item.get('content', 'Table content extracted')}\n")
+    if 'latex' in item:
+        parts.append(f"LaTeX representation: {item['latex']}\n")
+
+
+def _emit_image(parts, item, idx):
+    parts.append(f"\n[IMAGE {idx+1}]: {item.get('content', 'Image extracted and available')}\n")
+    if 'path' in item:
+        parts.append(f"Image file: {item['path']}\n")
+
+
+def _emit_text(parts, item, idx):
+    parts.append(f"\n{item.get('content', '')}\n")
+
+
+def _emit_formula(parts, item, idx):
+    parts.append(f"\n[FORMULA {idx+1}]: {item.get('latex', item.get('content', 'Mathematical formula'))}\n")
+
+
+# Regex fallback for MinerU table HTML when selectolax is unavailable
+_TR_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.DOTALL | re.IGNORECASE)
+_CELL_RE = re.compile(r'<t[hd][^>]*>(.*?)</t[hd]>', re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+@lru_cache(maxsize=TABLE_TEXT_CACHE_SIZE)
+def _table_html_to_text(html_table):
+    """Rows of an HTML table as 'cell | cell' lines; cached because datasheets repeat boilerplate tables"""
+    if SELECTOLAX_AVAILABLE:
+        tree = HTMLParser(html_table)
+        text_rows = []
+        for row in tree.css('tr'):
+            cells = [cell.text(separator=' ', strip=True) for cell in row.css('td, th')]
+            if cells:
+                text_rows.append(" | ".join(cells))
+        return "\n".join(text_rows) if text_rows else html_table
+    
+    # Simple HTML table parsing
+    text_rows = []
+    for row in _TR_RE.findall(html_table):
+        # Remove HTML tags and extract cell content
+        clean_cells = [_TAG_RE.sub('', cell).strip() for cell in _CELL_RE.findall(row)]
+        if clean_cells:
+            text_rows.append(" | ".join(clean_cells))
+    
+    return "\n".join(text_rows) if text_rows else html_table
+
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def _summarize_for_overview(text, limit=OVERVIEW_SUMMARY_CHARS):
+    """Up to `limit` chars of text cut on sentence boundaries, skipping repeated sentences
+    
+    Scraped pages repeat navigation and footer snippets; dropping duplicates
+    leaves more of the budget for product text. A first sentence longer than
+    the budget is cut at the last word boundary instead of mid-word.
+    """
+    if len(text) <= limit:
+        return text
+    
+    kept, seen, size = [], set(), 0
+    for sentence in _SENTENCE_END_RE.split(text):
+        if sentence in seen:
+            continue
+        if size + len(sentence) + 1 > limit:
+            break
+        seen.add(sentence)
+        kept.append(sentence)
+        size += len(sentence) + 1
+    
+    if kept:
+        return " ".join(kept)
+    return text[:limit].rsplit(" ", 1)[0]
+
+
+# Text emitters for MinerU structured content, keyed by item type
+MULTIMODAL_HANDLERS = {
+    'table': _emit_table,
+    'image': _emit_image,
+    'text': _emit_text,
+    'formula': _emit_formula,
+}
+
+
+def _extract_text_pymupdf(pdf_path):
+    with pymupdf.open(pdf_path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+def _extract_text_pypdfium2(pdf_path):
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+    finally:
+        pdf.close()
+
+
+def _extract_text_pypdf2(pdf_path):
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+# Fallback text extractors when MinerU fails, fastest first; only installed ones are listed
+PDF_TEXT_EXTRACTORS = tuple(
+    (name, extract) for name, module, extract in (
+        ("PyMuPDF", pymupdf, _extract_text_pymupdf),
+        ("pypdfium2", pypdfium2, _extract_text_pypdfium2),
+        ("PyPDF2", PyPDF2, _extract_text_pypdf2),
+    ) if module is not None
+)
+
+
+async def _iter_file_chunks(f):
+    """Stream an open file from its start in DOWNLOAD_CHUNK_SIZE pieces, leaving it open"""
+    await asyncio.to_thread(f.seek, 0)
+    while chunk := await asyncio.to_thread(f.read, DOWNLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+def _is_transient_error(e):
+    """Whether a Supabase client error is worth retrying (429/5xx or a transport failure)"""
+    # httpx errors carry .response, storage errors .status, PostgREST errors .code
+    for status in (getattr(getattr(e, "response", None), "status_code", None), getattr(e, "status", None), getattr(e, "code", None)):
+        try:
+            return int(status) in WRITE_RETRY_STATUSES
+        except (TypeError, ValueError):
+            continue
+    # httpx.TransportError (timeouts, dropped connections) without importing httpx here
+    return isinstance(e, (ConnectionError, TimeoutError)) or any(
+        cls.__name__ == "TransportError" for cls in type(e).__mro__
+    )
+
+
+def _is_duplicate_object_error(e):
+    """Whether a Storage upload failed because the object already exists
+    
+    The API answers 409, or 400 with statusCode "409" / error "Duplicate" in the
+    body; storage3 surfaces those as .status/.code, older versions as a dict arg.
+    """
+    body = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
+    statuses = (
+        getattr(getattr(e, "response", None), "status_code", None),
+        getattr(e, "status", None),
+        body.get("statusCode"),
+    )
+    for status in statuses:
+        try:
+            if int(status) == 409:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return getattr(e, "code", None) == "Duplicate" or body.get("error") == "Duplicate"
+
+
+@dataclass(slots=True)
+class CLItem:
+    """One MinerU content-list entry, with the fields the text builder uses"""
+    type: str
+    text: str = ''
+    table_body: str = ''
+    table_caption: str = ''
+    img_caption: str = ''
+    img_path: str = ''
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(
+            type=item.get('type', ''),
+            text=item.get('text') or '',
+            table_body=item.get('table_body', ''),
+            table_caption=(item.get('table_caption') or [''])[0],
+            img_caption=(item.get('img_caption') or [''])[0],
+            img_path=item.get('img_path', ''),
+        )
+
+
+def _scan_mineru_output(auto_dir):
+    """List a MinerU auto/ directory once: (markdown path, content list path, all entry paths)
+    
+    Returns None when the directory does not exist.
+    """
+    try:
+        with os.scandir(auto_dir) as it:
+            entries = list(it)
+    except FileNotFoundError:
+        return None
+    md_file = next((e.path for e in entries if e.name.endswith('.md') and e.is_file()), None)
+    content_list_file = next((e.path for e in entries if e.name.endswith('_content_list.json') and e.is_file()), None)
+    return md_file, content_list_file, [e.path for e in entries]
+
+
+def _safe_table_to_text(html_table):
+    """_table_html_to_text, falling back to the raw HTML when it cannot be parsed"""
+    try:
+        return _table_html_to_text(html_table)
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not parse HTML table: {e}")
+        return html_table
+
+
+def _enhanced_text_sections(base_text, items, source_url, images_base_dir, uploaded_urls):
+    """Yield the enhanced text for typed content-list items, given {img_path: public_url} of uploaded images"""
+    yield f"📄 SOURCE DOCUMENT: {source_url}"
+    yield f"\n🔗 ORIGINAL URL: {source_url}"
+    yield "\n\nCONTENT:\n"
+    
+    # Add base text first
+    if base_text:
+        yield f"\n{base_text}"
+    
+    # Process content list for multimodal elements with Supabase Storage URLs
+    tables_found = []
+    images_found = []
+    public_images, local_images = [], []  # images_found split by upload outcome
+    
+    for item in items:
+        content_type = item.type
+        
+        if content_type == "table":
+            table_caption = item.table_caption
+            
+            # Convert HTML table to readable text
+            table_text = _safe_table_to_text(item.table_body)
+            table_desc = f"\n\n📊 TABLE: {table_caption}\n{table_text}\n"
+            
+            yield f"\n{table_desc}"
+            tables_found.append(table_caption or f"Table {len(tables_found) + 1}")
+            
+        elif content_type == "image":
+            img_caption = item.img_caption
+            img_path = item.img_path
+            
+            # Public URL from the Supabase Storage upload, if it succeeded
+            public_url = uploaded_urls.get(img_path)
+            
+            # Create image description with public URL
+            if public_url:
+                img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📷 Public URL: {public_url}\n📁 Original Path: {img_path}\n"
+                image_url = public_url
+            elif images_base_dir and img_path:
+                # Fallback to local path if upload failed
+                local_url = f"file:///{Path(images_base_dir) / img_path}"
+                img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📁 Local URL: {local_url}\n📁 Path: {img_path}\n"
+                image_url = local_url
+            else:
+                img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📁 Location: {img_path}\n"
+                image_url = img_path
+            
+            yield f"\n{img_desc}"
+            image_entry = {
+                "caption": img_caption or f"Image {len(images_found) + 1}",
+                "path": img_path,
+                "url": image_url,
+                "public": bool(public_url)
+            }
+            images_found.append(image_entry)
+            (public_images if public_url else local_images).append(image_entry)
+            
+        elif content_type == "text" and item.text:
+            # Additional text content
+            text_content = item.text.strip()
+            if text_content and text_content not in base_text:
+                yield f"\n\n{text_content}"
+    
+    # Add comprehensive summary with URLs
+    if tables_found or images_found:
+        summary = ["\n\n📋 MULTIMODAL CONTENT SUMMARY:\n", f"🔗 Source: {source_url}\n"]
+        
+        if tables_found:
+            summary.append(f"📊 Tables ({len(tables_found)}): {', '.join(tables_found)}\n")
+        if images_found:
+            summary.append(f"🖼️ Images ({len(images_found)}):\n")
+            if public_images:
+                summary.append(f"   📷 Public Images ({len(public_images)}):\n")
+                summary.extend(f"      {i}. {img['caption']} - {img['url']}\n" for i, img in enumerate(public_images, 1))
+            if local_images:
+                summary.append(f"   📁 Local Images ({len(local_images)}):\n")
+                summary.extend(f"      {i}. {img['caption']} - {img['path']}\n" for i, img in enumerate(local_images, 1))
+        
+        yield "\n" + "".join(summary)
+    
+    # Add reference footer
+    yield f"\n\n\n📚 REFERENCE: For full technical details, see {source_url}"
+
+
 class LightRAGServerClient:
-    def __init__(self, lightrag_server_url="http://localhost:8020"):
-        """Initialize client for existing LightRAG server"""
+    # MinerU flags shared by every run; per-call arguments are appended in _mineru_cmd
+    _MINERU_BASE_CMD = (
+        "mineru",
+        "-l", "en",                 # English language for better OCR performance
+        "-d", "cpu",                # Use CPU since CUDA not compiled with PyTorch
+        "-b", "pipeline",           # Use pipeline backend for better processing
+        "-f", "true",               # Enable formula parsing
+        "-t", "true",               # Enable table parsing
+    )
+    
+    def __init__(self, lightrag_server_url="http://localhost:8020", persist_debug_json=False):
+        """Initialize client for existing LightRAG server
+        
+        persist_debug_json keeps a local copy of each uploaded multimodal
+        document's structured JSON in WORKING_DIR; the canonical content
+        lives on the LightRAG server, so this is off by default.
+        """
         
         # Supabase setup
         self.supabase_url = os.getenv("SUPABASE_URL")
@@ -46,113 +488,442 @@ class LightRAGServerClient:
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("[ERROR] SUPABASE_URL and SUPABASE_ANON_KEY environment variables are required")
         
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
+        self._supabase = None
         
         # LightRAG server configuration
         self.lightrag_server_url = lightrag_server_url.rstrip('/')
         self.lightrag_api_key = os.getenv("LIGHTRAG_API_KEY")
         self.working_dir = os.getenv("WORKING_DIR", "./processed_content")
+        self.max_concurrent_datasheets = int(os.getenv("MAX_CONCURRENT_DATASHEETS", DATASHEET_CONCURRENCY))
         Path(self.working_dir).mkdir(exist_ok=True)
         
         # Process tracking for async MinerU operations
         self.active_processes = {}  # Track running MinerU processes
-        self.background_polling_task = None  # Background task for automatic polling
-        self.polling_interval = 30  # seconds between checks
-        self.auto_polling_enabled = True  # Enable automatic background polling
+        self.background_polling_task = None  # Background task that uploads finished processes
+        self.auto_polling_enabled = True  # Enable automatic background uploads
+        self._completed_q = asyncio.Queue()  # IDs of tracked processes that have exited, fed by exit callbacks
+        self._upload_q = asyncio.Queue(maxsize=UPLOAD_QUEUE_SIZE)  # (process_id, process_data, result) awaiting upload
+        self._upload_workers = []  # Background uploader tasks draining _upload_q
+        
+        # Shared HTTP session for LightRAG server calls (created lazily inside the event loop)
+        self._session = None
+        self._request_semaphore = None
+        self._server_check = None  # In-flight or last connection check task
+        self._server_ok_until = 0.0  # monotonic deadline until which the server is assumed up
+        self._mineru_semaphore = None
+        self._mineru_batcher = None  # Coalesces process_pdf_with_mineru_async calls into directory runs
+        self._mkdir_cache = set()
+        self._images_dir_cache = {}  # MinerU output_dir -> its images/ dir, or None when absent
+        self._http = None  # Separate session for external sites; must not carry the API key
+        
+        # Background disk writes for the optional debug JSON copies
+        self.persist_debug_json = persist_debug_json
+        self._io_pool = None
+        
+        # Public URLs of images already in storage, keyed by content digest (LRU, shared by upload threads)
+        self._image_url_cache = OrderedDict()
+        self._image_url_lock = threading.Lock()
+        # Buckets confirmed to exist, mapped to whether they are public
+        self._known_buckets = {}
+        
+        # Scraped pages keyed by URL: (etag, last_modified, result); mirrored to disk when diskcache is installed
+        self._page_cache = OrderedDict()
+        self._page_disk_cache = None
+        if DISKCACHE_AVAILABLE:
+            self._page_disk_cache = diskcache.Cache(str(Path(self.working_dir) / "page_cache"))
+        
+        # Short-lived Supabase row lookups and already-inserted text bodies: key -> (value, expires_at)
+        self._row_cache = OrderedDict()
+        self._insert_dedup = OrderedDict()
         
         if not self.lightrag_api_key:
             logger.warning("[WARNING] LIGHTRAG_API_KEY not found in environment variables")
         
         logger.info(f"[OK] LightRAG Server Client initialized (Server: {self.lightrag_server_url})")
     
-    def _get_auth_headers(self):
-        """Get authentication headers for LightRAG server"""
-        headers = {'Content-Type': 'application/json'}
-        if self.lightrag_api_key:
-            # Server expects X-API-Key header per OpenAPI spec
-            headers['X-API-Key'] = self.lightrag_api_key
-        return headers
+    @property
+    def supabase(self):
+        """Supabase client, imported and created lazily so query-only runs skip it"""
+        if self._supabase is None:
+            from supabase import create_client
+            self._supabase = create_client(self.supabase_url, self.supabase_key)
+        return self._supabase
     
-    def _get_upload_auth_headers(self):
-        """Get authentication headers for file uploads (no Content-Type)"""
-        headers = {}
-        if self.lightrag_api_key:
+    def _get_session(self):
+        """Return the shared aiohttp session for the LightRAG server, creating it on first use"""
+        if self._session is None or self._session.closed:
             # Server expects X-API-Key header per OpenAPI spec
-            headers['X-API-Key'] = self.lightrag_api_key
-        return headers
+            headers = {'X-API-Key': self.lightrag_api_key} if self.lightrag_api_key else {}
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                connector=aiohttp.TCPConnector(limit=LIGHTRAG_MAX_CONCURRENCY * 2, keepalive_timeout=30),
+                json_serialize=_json_dumps
+            )
+            self._request_semaphore = AdaptiveLimiter(
+                initial=LIGHTRAG_INITIAL_CONCURRENCY,
+                maximum=LIGHTRAG_MAX_CONCURRENCY,
+                window=AIMD_WINDOW,
+                decrease_rate=AIMD_DECREASE_RATE,
+                increase_rate=AIMD_INCREASE_RATE
+            )
+        return self._session
+    
+    def _get_http_session(self):
+        """Return the pooled aiohttp session used for page scraping and datasheet downloads"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+            )
+        return self._http
     
-    def test_lightrag_server_connection(self):
+    async def _fetch_with_retry(self, url, timeout, handler, headers=None):
+        """GET url and pass the response to handler, retrying 502/503/504 and connection errors"""
+        session = self._get_http_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                async with session.get(url, timeout=client_timeout, headers=headers) as response:
+                    if response.status not in FETCH_RETRY_STATUSES or attempt == FETCH_RETRIES:
+                        response.raise_for_status()
+                        return await handler(response)
+            except aiohttp.ClientResponseError:
+                raise
+            except aiohttp.ClientError:
+                if attempt == FETCH_RETRIES:
+                    raise
+            await asyncio.sleep(FETCH_BACKOFF * (2 ** attempt))
+    
+    async def _download_file(self, url, dest_path, timeout=300):
+        """Stream url to dest_path in DOWNLOAD_CHUNK_SIZE pieces
+        
+        Disk writes run in a worker thread so concurrent downloads don't stall
+        the event loop, and the body lands in a .part file that is only renamed
+        into place once complete.
+        """
+        part_path = f"{dest_path}.part"
+        
+        async def write_body(response):
+            f = await asyncio.to_thread(open, part_path, 'wb')
+            try:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        
+        try:
+            await self._fetch_with_retry(url, timeout, write_body)
+            os.replace(part_path, dest_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(part_path)
+            raise
+        return dest_path
+    
+    async def aclose(self):
+        """Finish queued MinerU runs and close the shared HTTP sessions"""
+        if self._mineru_batcher is not None:
+            await self._mineru_batcher.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+        if self._page_disk_cache is not None:
+            self._page_disk_cache.close()
+        if self._io_pool is not None:
+            # Let pending debug JSON writes finish
+            await asyncio.to_thread(self._io_pool.shutdown, wait=True)
+            self._io_pool = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def _ensure_server(self):
+        """test_lightrag_server_connection, reusing a success for SERVER_CHECK_TTL seconds
+        
+        Concurrent callers share one probe; failures are not cached, so the
+        next caller checks again.
+        """
+        if time.monotonic() < self._server_ok_until:
+            return True
+        if self._server_check is None or self._server_check.done():
+            self._server_check = asyncio.ensure_future(self.test_lightrag_server_connection())
+        ok = await asyncio.shield(self._server_check)
+        if ok:
+            self._server_ok_until = time.monotonic() + SERVER_CHECK_TTL
+        return ok
+    
+    async def test_lightrag_server_connection(self):
         """Test connection to LightRAG server"""
         try:
-            # Try root endpoint first, then docs endpoint
-            headers = self._get_auth_headers()
+            session = self._get_session()
+            
+            # Single cheap liveness probe; any non-5xx answer means the server is up
+            async with session.head(
+                f"{self.lightrag_server_url}/health",
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT)
+            ) as response:
+                if response.status != 405:
+                    if response.status < 500:
+                        logger.info(f"[OK] LightRAG server connection successful (HEAD /health: {response.status})")
+                        return True
+                    logger.error(f"[ERROR] LightRAG server unhealthy: HEAD /health returned {response.status}")
+                    return False
+            
+            # Server doesn't allow HEAD: try root endpoint first, then docs endpoint
             for endpoint in ["", "/docs"]:
-                response = requests.get(f"{self.lightrag_server_url}{endpoint}", headers=headers, timeout=10)
-                if response.status_code == 200:
-                    logger.info(f"[OK] LightRAG server connection successful (endpoint: {endpoint or '/'})")
-                    return True
+                async with session.get(
+                    f"{self.lightrag_server_url}{endpoint}",
+                    timeout=aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT)
+                ) as response:
+                    if response.status == 200:
+                        logger.info(f"[OK] LightRAG server connection successful (endpoint: {endpoint or '/'})")
+                        return True
             
             logger.error(f"[ERROR] LightRAG server is not responding to standard endpoints")
             return False
-        except requests.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"[ERROR] Cannot connect to LightRAG server: {e}")
             return False
     
-    def insert_text_to_lightrag(self, text_content, doc_id=None):
-        """Insert text content to LightRAG server via file upload"""
+    async def _post_to_lightrag(self, session, path, build_kwargs, timeout=300):
+        """POST to the LightRAG server, retrying 429/5xx and connection errors with jittered backoff
+        
+        build_kwargs() is called per attempt (FormData bodies cannot be resent).
+        Returns (status, body): the parsed JSON on 200, otherwise the response text.
+        """
+        url = f"{self.lightrag_server_url}{path}"
+        for attempt in range(WRITE_RETRIES + 1):
+            retry_after = None
+            try:
+                async with self._request_semaphore:
+                    async with session.post(url, timeout=aiohttp.ClientTimeout(total=timeout), **build_kwargs()) as response:
+                        self._request_semaphore.record(response.status in (429, 503))
+                        if response.status == 200:
+                            return 200, await response.json(content_type=None, loads=_json_loads)
+                        body = await response.text()
+                        if response.status not in WRITE_RETRY_STATUSES or attempt == WRITE_RETRIES:
+                            return response.status, body
+                        retry_after = response.headers.get("Retry-After")
+                        logger.warning(f"[WARNING] {path} returned {response.status}, retrying ({attempt + 1}/{WRITE_RETRIES})")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == WRITE_RETRIES:
+                    raise
+                logger.warning(f"[WARNING] {path} failed ({e!r}), retrying ({attempt + 1}/{WRITE_RETRIES})")
+            await asyncio.sleep(backoff_delay(attempt, retry_after, base=WRITE_BACKOFF, cap=WRITE_BACKOFF_MAX))
+    
+    async def _supabase_execute(self, query):
+        """Run a Supabase query builder off the event loop, retrying 429/5xx and transport errors"""
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return await asyncio.to_thread(query.execute)
+            except Exception as e:
+                if attempt == WRITE_RETRIES or not _is_transient_error(e):
+                    raise
+                logger.warning(f"[WARNING] Supabase request failed ({e}), retrying ({attempt + 1}/{WRITE_RETRIES})")
+            await asyncio.sleep(backoff_delay(attempt, base=WRITE_BACKOFF, cap=WRITE_BACKOFF_MAX))
+    
+    async def _upload_file_async(self, session, filename, content, mime="text/plain"):
+        """Upload a single file to the LightRAG server, returning the parsed response or None"""
+        def build_form():
+            # Spooled bodies are streamed from the start on each attempt; aiohttp closes file payloads
+            body = _iter_file_chunks(content) if hasattr(content, "seek") else content
+            form = aiohttp.FormData()
+            form.add_field('file', body, filename=filename, content_type=mime)
+            return {"data": form}
+        
+        status, result = await self._post_to_lightrag(session, "/documents/upload", build_form)
+        if status != 200:
+            logger.error(f"[ERROR] Failed to upload {filename}: {status} - {result}")
+            return None
+        
+        logger.debug(f"[DEBUG] LightRAG response: {result}")
+        # Handle array response from LightRAG
+        if isinstance(result, list) and len(result) > 0:
+            logger.info(f"[INFO] Extracted track_id from array response: {result[0].get('track_id', 'N/A')}")
+            return result[0]  # Return first element if array
+        return result
+    
+    @staticmethod
+    def _ttl_get(cache, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.time():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+    
+    @staticmethod
+    def _ttl_put(cache, key, value, ttl, maxsize):
+        cache[key] = (value, time.time() + ttl)
+        cache.move_to_end(key)
+        while len(cache) > maxsize:
+            cache.popitem(last=False)
+    
+    @staticmethod
+    def _spool_text(filename, chunks):
+        """Write text chunks to a spooled temp file, returning (file, dedup key)"""
+        h = hashlib.sha256(f"{filename}\0".encode("utf-8"))
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            h.update(data)
+            spool.write(data)
+        spool.seek(0)
+        return spool, h.digest()
+    
+    async def insert_text_to_lightrag(self, text_content, doc_id=None):
+        """Insert text content to LightRAG server via file upload
+        
+        text_content may be a string or an iterable of string chunks; chunks are
+        spooled (to disk past UPLOAD_SPOOL_SIZE) and streamed rather than joined.
+        Identical (doc_id, text) bodies already uploaded this run are not sent again.
+        """
+        body = None
         try:
-            # Create a temporary text file
             filename = f"{doc_id or 'content'}.txt"
+            if isinstance(text_content, str):
+                body = text_content
+                key = self._dedup_key(filename, text_content)
+            else:
+                # Chunk generators may do blocking work (e.g. Storage uploads), so spool in a thread
+                body, key = await asyncio.to_thread(self._spool_text, filename, text_content)
             
-            # Prepare the file for upload
-            files = {
-                'file': (filename, text_content, 'text/plain')
-            }
-            
-            # Get auth headers for file upload
-            headers = self._get_upload_auth_headers()
-            
-            response = requests.post(
-                f"{self.lightrag_server_url}/documents/upload",
-                files=files,
-                headers=headers,
-                timeout=300
-            )
+            result = self._ttl_get(self._insert_dedup, key)
+            if result is not None:
+                logger.info(f"[OK] {filename} already uploaded to LightRAG server, skipping")
+                return result
             
-            if response.status_code == 200:
-                result = response.json()
+            result = await self._upload_file_async(self._get_session(), filename, body)
+            if result is not None:
                 logger.info(f"[OK] Text uploaded to LightRAG server")
-                logger.debug(f"[DEBUG] LightRAG response: {result}")
-                # Handle array response from LightRAG
-                if isinstance(result, list) and len(result) > 0:
-                    logger.info(f"[INFO] Extracted track_id from array response: {result[0].get('track_id', 'N/A')}")
-                    return result[0]  # Return first element if array
-                return result
-            else:
-                logger.error(f"[ERROR] Failed to upload text: {response.status_code} - {response.text}")
-                return None
+                self._ttl_put(self._insert_dedup, key, result, INSERT_DEDUP_TTL, INSERT_DEDUP_SIZE)
+            return result
                 
         except Exception as e:
             logger.error(f"[ERROR] Error uploading text to LightRAG: {e}")
             return None
+        finally:
+            if body is not None and not isinstance(body, str):
+                body.close()
+    
+    @staticmethod
+    def _dedup_key(filename, text):
+        return hashlib.sha256(f"{filename}\0{text}".encode("utf-8")).digest()
+    
+    async def insert_many(self, texts):
+        """Upload several (doc_id, text) pairs concurrently over the shared session
+        
+        Returns one entry per input: the server response, None on a non-200
+        reply, or the raised exception. Pairs already uploaded this run are
+        answered from the dedup cache.
+        """
+        session = self._get_session()
+        
+        async def upload_one(doc_id, text):
+            filename = f"{doc_id or 'content'}.txt"
+            key = self._dedup_key(filename, text)
+            result = self._ttl_get(self._insert_dedup, key)
+            if result is None:
+                result = await self._upload_file_async(session, filename, text)
+                if result is not None:
+                    self._ttl_put(self._insert_dedup, key, result, INSERT_DEDUP_TTL, INSERT_DEDUP_SIZE)
+            return result
+        
+        results = await asyncio.gather(*[upload_one(doc_id, text) for doc_id, text in texts], return_exceptions=True)
+        uploaded = sum(1 for r in results if r is not None and not isinstance(r, BaseException))
+        logger.info(f"[OK] Uploaded {uploaded}/{len(results)} documents to LightRAG server")
+        return results
+    
+    async def insert_texts_to_lightrag(self, texts):
+        """Insert several (doc_id, text) pairs with one /documents/texts request
+        
+        Falls back to one upload per document when the server rejects the batch
+        endpoint (older LightRAG servers). Pairs already uploaded this run are
+        left out of the request. Returns the server response, or None if any
+        document failed.
+        """
+        if not texts:
+            return None
+        
+        # Drop (doc_id, text) pairs whose identical body was already uploaded
+        pending, cached = [], None
+        for doc_id, text in texts:
+            filename = f"{doc_id or 'content'}.txt"
+            key = self._dedup_key(filename, text)
+            hit = self._ttl_get(self._insert_dedup, key)
+            if hit is None:
+                pending.append((doc_id, text, filename, key))
+            else:
+                cached = hit
+        if not pending:
+            logger.info(f"[OK] All {len(texts)} documents already uploaded to LightRAG server, skipping")
+            return cached
+        if len(pending) < len(texts):
+            logger.info(f"[OK] Skipping {len(texts) - len(pending)} documents already uploaded to LightRAG server")
+        texts = [(doc_id, text) for doc_id, text, _, _ in pending]
+        
+        session = self._get_session()
+        payload = {
+            "texts": [text for _, text in texts],
+            "file_sources": [filename for _, _, filename, _ in pending]
+        }
+        try:
+            status, result = await self._post_to_lightrag(session, "/documents/texts", lambda: {"json": payload})
+            if status == 200:
+                logger.info(f"[OK] Inserted {len(texts)} documents to LightRAG server in one request")
+                for _, _, _, key in pending:
+                    self._ttl_put(self._insert_dedup, key, result, INSERT_DEDUP_TTL, INSERT_DEDUP_SIZE)
+                return result
+            if not 400 <= status < 500 or status == 429:
+                logger.error(f"[ERROR] Batch insert failed: {status} - {result}")
+                return None
+            logger.warning(f"[WARNING] Batch insert rejected ({status}), uploading {len(texts)} documents one by one")
+        except Exception as e:
+            logger.error(f"[ERROR] Error batch inserting to LightRAG: {e}")
+            return None
+        
+        results = await self.insert_many(texts)
+        if any(r is None or isinstance(r, BaseException) for r in results):
+            return None
+        return results[-1]
     
-    def insert_multimodal_content_to_lightrag(self, pdf_path, doc_id=None):
+    async def insert_multimodal_content_to_lightrag(self, pdf_path, doc_id=None):
         """Process PDF with RAGAnything/MinerU and upload multimodal content to LightRAG server"""
         try:
             logger.info(f"🔄 Processing PDF with RAGAnything multimodal extraction: {pdf_path}")
             
-            # Process PDF with MinerU to extract multimodal content
-            pdf_result = self.process_pdf_with_mineru(pdf_path, f"./temp_mineru_output_{doc_id or 'content'}")
+            # Skip re-upload of a PDF already sent under this doc_id (keyed on digest + doc_id)
+            digest = await asyncio.to_thread(self._file_digest, pdf_path)
+            upload_marker = self._mineru_cache_dir(digest) / f"uploaded_{doc_id or 'content'}.json"
+            if upload_marker.exists():
+                logger.info(f"[OK] PDF already uploaded to LightRAG, skipping: {pdf_path}")
+                return _load_json(upload_marker)
+            
+            # Process PDF with MinerU to extract multimodal content (asyncio subprocess, keeps the loop responsive)
+            pdf_result = await self.process_pdf_with_mineru_async(pdf_path, f"./temp_mineru_output_{doc_id or 'content'}")
             
             if not pdf_result:
                 logger.error("[ERROR] Failed to process PDF with MinerU")
                 return None
             
             # Create rich multimodal content
-            multimodal_content = self._create_multimodal_content(pdf_result, doc_id)
+            multimodal_content = await asyncio.to_thread(self._create_multimodal_content, pdf_result, doc_id)
             
             # Upload the multimodal content as a structured file
-            return self._upload_multimodal_file(multimodal_content, doc_id)
+            result = await self._upload_multimodal_file(multimodal_content, doc_id)
+            if result:
+                upload_marker.parent.mkdir(parents=True, exist_ok=True)
+                upload_marker.write_text(_json_dumps(result), encoding='utf-8')
+            return result
             
         except Exception as e:
             logger.error(f"[ERROR] Error processing multimodal content: {e}")
@@ -200,85 +971,61 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
     
     def _enhance_text_with_multimodal_info(self, base_text, structured_content):
         """Enhance text content with descriptions of images and tables for better RAG"""
-        enhanced_text = base_text + "\n\n=== MULTIMODAL CONTENT EXTRACTED BY RAGAnything ===\n"
+        parts = [base_text, "\n\n=== MULTIMODAL CONTENT EXTRACTED BY RAGAnything ===\n"]
         
         if isinstance(structured_content, list):
             for i, item in enumerate(structured_content):
-                if isinstance(item, dict):
-                    content_type = item.get('type', 'unknown')
-                    
-                    if content_type == 'table':
-                        enhanced_text += f"\n[TABLE {i+1}]: {item.get('content', 'Table content extracted')}\n"
-                        if 'latex' in item:
-                            enhanced_text += f"LaTeX representation: {item['latex']}\n"
-                    
-                    elif content_type == 'image':
-                        enhanced_text += f"\n[IMAGE {i+1}]: {item.get('content', 'Image extracted and available')}\n"
-                        if 'path' in item:
-                            enhanced_text += f"Image file: {item['path']}\n"
-                    
-                    elif content_type == 'text':
-                        enhanced_text += f"\n{item.get('content', '')}\n"
-                        
-                    elif content_type == 'formula':
-                        enhanced_text += f"\n[FORMULA {i+1}]: {item.get('latex', item.get('content', 'Mathematical formula'))}\n"
+                handler = MULTIMODAL_HANDLERS.get(item.get('type', 'unknown'))
+                if handler:
+                    handler(parts, item, i)
         
-        return enhanced_text
+        return "".join(parts)
     
-    def _upload_multimodal_file(self, multimodal_content, doc_id):
+    async def _upload_multimodal_file(self, multimodal_content, doc_id):
         """Upload multimodal content as a structured JSON file"""
         try:
-            # Create filename
-            filename = f"{doc_id or 'multimodal_content'}.json"
-            
-            # Convert to JSON string
-            json_content = json.dumps(multimodal_content, indent=2, ensure_ascii=False)
-            
             # Upload the enhanced text content (which includes table/image descriptions)
             text_to_upload = multimodal_content.get("enhanced_text", multimodal_content.get("text_content", ""))
             
-            files = {
-                'file': (f"{doc_id or 'content'}_enhanced.txt", text_to_upload, 'text/plain')
-            }
-            
-            # Get auth headers for file upload
-            headers = self._get_upload_auth_headers()
-            
-            response = requests.post(
-                f"{self.lightrag_server_url}/documents/upload",
-                files=files,
-                headers=headers,
-                timeout=300
+            result = await self._upload_file_async(
+                self._get_session(),
+                f"{doc_id or 'content'}_enhanced.txt",
+                text_to_upload
             )
             
-            if response.status_code == 200:
-                result = response.json()
+            if result is not None:
                 logger.info(f"[OK] Multimodal content uploaded to LightRAG server (enhanced with tables/images)")
                 
-                # Handle array response from LightRAG
-                if isinstance(result, list) and len(result) > 0:
-                    result = result[0]  # Use first element if array
-                
-                # Also save the full structured content locally for reference
-                output_file = Path(self.working_dir) / f"{filename}"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(json_content)
-                logger.info(f"📄 Full multimodal content saved to: {output_file}")
+                # Optionally save the full structured content locally for reference, off the upload path
+                output_file = None
+                if self.persist_debug_json:
+                    output_file = Path(self.working_dir) / f"{doc_id or 'multimodal_content'}.json"
+                    if self._io_pool is None:
+                        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='diskio')
+                    self._io_pool.submit(self._write_debug_json, output_file, multimodal_content)
                 
                 return {
                     "upload_result": result,
-                    "local_file": str(output_file),
+                    "local_file": str(output_file) if output_file else None,
                     "content_type": "multimodal_enhanced"
                 }
             else:
-                logger.error(f"[ERROR] Failed to upload multimodal content: {response.status_code} - {response.text}")
+                logger.error("[ERROR] Failed to upload multimodal content")
                 return None
                 
         except Exception as e:
             logger.error(f"[ERROR] Error uploading multimodal file: {e}")
             return None
     
-    def query_lightrag_server(self, question, mode="hybrid"):
+    @staticmethod
+    def _write_debug_json(output_file, multimodal_content):
+        try:
+            output_file.write_text(_dumps_pretty(multimodal_content), encoding='utf-8')
+            logger.info(f"📄 Full multimodal content saved to: {output_file}")
+        except OSError as e:
+            logger.warning(f"[WARNING] Could not save multimodal content to {output_file}: {e}")
+    
+    async def query_lightrag_server(self, question, mode="hybrid"):
         """Query the LightRAG server"""
         try:
             payload = {
@@ -286,21 +1033,21 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 "param": mode
             }
             
-            headers = self._get_auth_headers()
-            
-            response = requests.post(
-                f"{self.lightrag_server_url}/query",
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", result)
-            else:
-                logger.error(f"[ERROR] Query failed: {response.status_code} - {response.text}")
-                return f"Error: {response.text}"
+            session = self._get_session()
+            
+            async with self._request_semaphore:
+                async with session.post(
+                    f"{self.lightrag_server_url}/query",
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    if response.status == 200:
+                        result = await response.json(content_type=None, loads=_json_loads)
+                        return result.get("response", result)
+                    else:
+                        text = await response.text()
+                        logger.error(f"[ERROR] Query failed: {response.status} - {text}")
+                        return f"Error: {text}"
                 
         except Exception as e:
             logger.error(f"[ERROR] Error querying LightRAG server: {e}")
@@ -308,17 +1055,23 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
     
     def setup_storage_bucket(self, bucket_name="rag-images"):
         """Create a public storage bucket for images if it doesn't exist"""
+        # Buckets already confirmed by this client need no round-trip
+        if bucket_name in self._known_buckets:
+            return bucket_name
+        
         try:
             # Check if bucket exists
             buckets = self.supabase.storage.list_buckets()
-            bucket_exists = any(bucket.name == bucket_name for bucket in buckets)
+            bucket = next((b for b in buckets if b.name == bucket_name), None)
             
-            if not bucket_exists:
+            if bucket is None:
                 # Create public bucket with correct parameters
                 result = self.supabase.storage.create_bucket(bucket_name, options={"public": True})
                 logger.info(f"[OK] Created public storage bucket: {bucket_name}")
+                self._known_buckets[bucket_name] = True
             else:
                 logger.info(f"[OK] Storage bucket already exists: {bucket_name}")
+                self._known_buckets[bucket_name] = bool(getattr(bucket, "public", False))
             
             return bucket_name
         except Exception as e:
@@ -326,13 +1079,37 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             # Try to return bucket name anyway if it exists
             try:
                 buckets = self.supabase.storage.list_buckets()
-                if any(bucket.name == bucket_name for bucket in buckets):
+                bucket = next((b for b in buckets if b.name == bucket_name), None)
+                if bucket is not None:
                     logger.info(f"[OK] Using existing bucket: {bucket_name}")
+                    self._known_buckets[bucket_name] = bool(getattr(bucket, "public", False))
                     return bucket_name
             except:
                 pass
             return None
     
+    def _public_url(self, bucket_name, object_path):
+        """Public URL of a storage object, built locally for buckets known to be public"""
+        if self._known_buckets.get(bucket_name):
+            return f"{self.supabase_url.rstrip('/')}/storage/v1/object/public/{bucket_name}/{object_path}"
+        return self.supabase.storage.from_(bucket_name).get_public_url(object_path)
+    
+    def _storage_upload(self, bucket_name, object_path, file_path, file_options):
+        """Upload a file to Supabase Storage, retrying 429/5xx and transport errors with jittered backoff
+        
+        Runs in upload worker threads, so it sleeps rather than awaiting.
+        """
+        with open(file_path, 'rb') as f:
+            for attempt in range(WRITE_RETRIES + 1):
+                f.seek(0)
+                try:
+                    return self.supabase.storage.from_(bucket_name).upload(object_path, f, file_options)
+                except Exception as e:
+                    if attempt == WRITE_RETRIES or not _is_transient_error(e):
+                        raise
+                    logger.warning(f"[WARNING] Storage upload of {object_path} failed ({e}), retrying ({attempt + 1}/{WRITE_RETRIES})")
+                time.sleep(backoff_delay(attempt, base=WRITE_BACKOFF, cap=WRITE_BACKOFF_MAX))
+    
     def upload_image_to_storage(self, image_path, bucket_name="rag-images", folder="images"):
         """Upload an image to Supabase Storage and return the public URL"""
         try:
@@ -344,25 +1121,17 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             file_extension = Path(image_path).suffix
             unique_filename = f"{folder}/{uuid.uuid4().hex}{file_extension}"
             
-            # Read image file
-            with open(image_path, 'rb') as f:
-                file_data = f.read()
-            
             # Determine MIME type
             mime_type, _ = mimetypes.guess_type(image_path)
             if not mime_type:
                 mime_type = 'image/jpeg'  # Default fallback
             
-            # Upload to Supabase Storage
-            result = self.supabase.storage.from_(bucket_name).upload(
-                unique_filename, 
-                file_data,
-                {"content-type": mime_type}
-            )
+            # Upload to Supabase Storage, streaming from the open file rather than reading it into memory
+            result = self._storage_upload(bucket_name, unique_filename, image_path, {"content-type": mime_type})
             
             if result:
                 # Get public URL
-                public_url = self.supabase.storage.from_(bucket_name).get_public_url(unique_filename)
+                public_url = self._public_url(bucket_name, unique_filename)
                 logger.info(f"[OK] Image uploaded to storage: {unique_filename}")
                 return public_url
             else:
@@ -373,7 +1142,48 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             logger.error(f"[ERROR] Error uploading image to storage: {e}")
             return None
     
-    def upload_images_from_directory(self, images_dir, bucket_name="rag-images", folder_prefix=""):
+    def upload_image_deduplicated(self, image_path, bucket_name="rag-images"):
+        """Upload an image under a content-addressed name and return the public URL
+        
+        Identical images, within a document or across documents, map to the
+        same sha/<xx>/<digest><ext> object, so each is uploaded at most once.
+        """
+        try:
+            digest = self._file_digest(image_path)
+            with self._image_url_lock:
+                public_url = self._image_url_cache.get(digest)
+                if public_url:
+                    self._image_url_cache.move_to_end(digest)
+                    return public_url
+            
+            object_path = f"sha/{digest[:2]}/{digest}{Path(image_path).suffix.lower()}"
+            mime_type, _ = mimetypes.guess_type(image_path)
+            
+            try:
+                self._storage_upload(
+                    bucket_name, object_path, image_path,
+                    {"content-type": mime_type or 'image/jpeg', "upsert": "false"}
+                )
+                logger.info(f"[OK] Image uploaded to storage: {object_path}")
+            except Exception as e:
+                # An existing object with this name has identical content
+                if not _is_duplicate_object_error(e):
+                    raise
+                logger.debug(f"[DEBUG] Image already in storage: {object_path}")
+            
+            public_url = self._public_url(bucket_name, object_path)
+            with self._image_url_lock:
+                self._image_url_cache[digest] = public_url
+                self._image_url_cache.move_to_end(digest)
+                while len(self._image_url_cache) > IMAGE_URL_CACHE_SIZE:
+                    self._image_url_cache.popitem(last=False)
+            return public_url
+            
+        except Exception as e:
+            logger.error(f"[ERROR] Error uploading image to storage: {e}")
+            return None
+    
+    def upload_images_from_directory(self, images_dir, bucket_name="rag-images"):
         """Upload all images from a directory to Supabase Storage"""
         try:
             images_dir = Path(images_dir)
@@ -382,18 +1192,17 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 return {}
             
             uploaded_images = {}
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']
-            
-            for image_file in images_dir.iterdir():
-                if image_file.suffix.lower() in image_extensions:
-                    folder_name = f"{folder_prefix}/{images_dir.name}" if folder_prefix else images_dir.name
-                    public_url = self.upload_image_to_storage(
-                        str(image_file), 
-                        bucket_name, 
-                        folder_name
-                    )
+            image_files = [f for f in images_dir.iterdir() if f.suffix.lower() in IMAGE_EXT_SET]
+            
+            with ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS) as executor:
+                futures = {
+                    executor.submit(self.upload_image_deduplicated, str(f), bucket_name): f
+                    for f in image_files
+                }
+                for future in as_completed(futures):
+                    public_url = future.result()
                     if public_url:
-                        uploaded_images[image_file.name] = public_url
+                        uploaded_images[futures[future].name] = public_url
             
             logger.info(f"[OK] Uploaded {len(uploaded_images)} images from {images_dir}")
             return uploaded_images
@@ -402,6 +1211,96 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             logger.error(f"[ERROR] Error uploading images from directory: {e}")
             return {}
     
+    @classmethod
+    def _mineru_cmd(cls, pdf_path, output_dir, mode):
+        """MinerU argv for one PDF (or a directory of PDFs); mode is auto (full extraction) or txt (fast text-only)"""
+        return [*cls._MINERU_BASE_CMD, "-p", str(pdf_path), "-o", str(output_dir), "-m", mode]
+    
+    def _ensure_dir(self, path):
+        """mkdir -p, skipped for directories this client already created"""
+        key = str(path)
+        if key not in self._mkdir_cache:
+            Path(path).mkdir(parents=True, exist_ok=True)
+            self._mkdir_cache.add(key)
+    
+    @staticmethod
+    def _file_digest(path):
+        """Content fingerprint of a file, streamed in 1 MiB chunks"""
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    
+    def _mineru_cache_dir(self, digest, mode="auto"):
+        return Path(self.working_dir) / MINERU_CACHE_DIRNAME / f"{digest}-{mode}"
+    
+    def _ingested_marker(self, doc_id):
+        return Path(self.working_dir) / INGESTED_DIRNAME / f"{doc_id}.json"
+    
+    def _load_ingested(self, doc_id, url):
+        """Upload result recorded for doc_id, or None if it was not ingested from this url"""
+        marker = self._ingested_marker(doc_id)
+        if not marker.exists():
+            return None
+        try:
+            record = _load_json(marker)
+        except (OSError, ValueError):
+            return None
+        # doc_ids are positional, so only trust the marker if it still points at the same datasheet
+        return record.get("result") if record.get("url") == url else None
+    
+    def _mark_ingested(self, doc_id, url, result):
+        marker = self._ingested_marker(doc_id)
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.write_text(_json_dumps({"url": url, "result": result}), encoding='utf-8')
+        except OSError as e:
+            logger.warning(f"[WARNING] Could not record {doc_id} as ingested: {e}")
+    
+    def _load_mineru_cache(self, cache_dir):
+        """Return a cached MinerU result, or None if this PDF has not been processed before"""
+        if not (cache_dir / "done.flag").exists():
+            return None
+        content_list_file = cache_dir / "content_list.json"
+        structured_content = None
+        if content_list_file.exists():
+            structured_content = _load_json(content_list_file)
+        # Entries cached without MinerU's images would silently drop image uploads
+        if isinstance(structured_content, list) and not (cache_dir / "images").is_dir():
+            if any(isinstance(item, dict) and item.get("img_path") for item in structured_content):
+                return None
+        return {
+            "extracted_text": _read_text(cache_dir / "content.md"),
+            "structured_content": structured_content,
+            "output_dir": str(cache_dir),
+            "files_created": [str(f) for f in cache_dir.glob("*")]
+        }
+    
+    def _store_mineru_cache(self, cache_dir, md_file, content_list_file=None, images_dir=None):
+        """Copy MinerU output (markdown, content list, images) into the cache
+        
+        done.flag is written last so partial copies are never served. Images are
+        hardlinked where the filesystem allows it.
+        """
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for src, name in ((md_file, "content.md"), (content_list_file, "content_list.json")):
+                if src is None:
+                    continue
+                tmp = cache_dir / f".{name}.tmp"
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, cache_dir / name)
+            if images_dir is not None and Path(images_dir).is_dir():
+                tmp = cache_dir / ".images.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                shutil.copytree(images_dir, tmp, copy_function=_link_or_copy)
+                shutil.rmtree(cache_dir / "images", ignore_errors=True)
+                os.replace(tmp, cache_dir / "images")
+            (cache_dir / "done.flag").touch()
+        except OSError as e:
+            logger.warning(f"[WARNING] Could not cache MinerU output in {cache_dir}: {e}")
+    
     def process_pdf_with_mineru(self, pdf_path, output_dir, fast_text_only=False, low_memory=True):
         """Process PDF using MinerU for text, image, and table extraction"""
         try:
@@ -409,23 +1308,21 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 return None
             
             mode = "txt" if fast_text_only else "auto"
+            
+            # Skip MinerU entirely for PDFs whose bytes were processed before
+            cache_dir = self._mineru_cache_dir(self._file_digest(pdf_path), mode)
+            cached = self._load_mineru_cache(cache_dir)
+            if cached:
+                logger.info(f"[OK] Using cached MinerU output for {pdf_path}: {cache_dir}")
+                return cached
+            
             logger.info(f"📄 Processing PDF with MinerU ({mode} mode): {pdf_path}")
             
             # Create output directory
-            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(output_dir)
             
             # Run MinerU command with optimized RAGAnything settings
-            cmd = [
-                "mineru",
-                "-p", str(pdf_path),
-                "-o", str(output_dir),
-                "-m", mode,                 # auto=full extraction, txt=fast text-only
-                "-l", "en",                 # English language for better OCR performance
-                "-d", "cpu",                # Use CPU since CUDA not compiled with PyTorch
-                "-b", "pipeline",           # Use pipeline backend for better processing
-                "-f", "true",               # Enable formula parsing
-                "-t", "true"                # Enable table parsing
-            ]
+            cmd = self._mineru_cmd(pdf_path, output_dir, mode)
             
             # Set timeout based on mode and memory settings - give full 20 minutes for comprehensive processing
             if low_memory:
@@ -437,55 +1334,15 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 timeout = 1200  # 20 minutes for comprehensive multimodal extraction
                 logger.info(f"🔧 Standard mode: {timeout}s timeout for high-quality multimodal extraction")
             
-            logger.info(f"🔧 Running MinerU with RAGAnything settings: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔧 Running MinerU with RAGAnything settings: %s", shlex.join(cmd))
             # Use dynamic timeout based on hardware capabilities
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-            
-            # Always check for output files regardless of return code
-            # MinerU sometimes returns non-zero even when successful
-            pdf_name = Path(pdf_path).stem
-            auto_dir = Path(output_dir) / pdf_name / "auto"
+            # MinerU's progress output is large; send it to a log file instead of buffering it in memory
+            log_path = Path(output_dir) / f"{Path(pdf_path).stem}.mineru.log"
+            with open(log_path, 'wb') as log_file:
+                result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=log_file, timeout=timeout)
             
-            if result.returncode == 0:
-                logger.info("[OK] MinerU processing completed successfully")
-            else:
-                logger.warning(f"[WARNING] MinerU returned code {result.returncode}, but checking for output files")
-                logger.warning(f"[WARNING] MinerU stderr: {result.stderr}")
-            
-            # Check for output files regardless of return code
-            if auto_dir.exists():
-                logger.info(f"[OK] Found MinerU output directory: {auto_dir}")
-                # Get markdown content
-                md_files = list(auto_dir.glob("*.md"))
-                if md_files:
-                    with open(md_files[0], 'r', encoding='utf-8') as f:
-                        extracted_text = f.read()
-                    
-                    # Get structured content
-                    content_list_files = list(auto_dir.glob("*_content_list.json"))
-                    structured_content = None
-                    if content_list_files:
-                        with open(content_list_files[0], 'r', encoding='utf-8') as f:
-                            structured_content = json.load(f)
-                    
-                    logger.info(f"[OK] Successfully extracted {len(extracted_text)} chars from MinerU")
-                    return {
-                        "extracted_text": extracted_text,
-                        "structured_content": structured_content,
-                        "output_dir": str(auto_dir),
-                        "files_created": [str(f) for f in auto_dir.glob("*")]
-                    }
-                else:
-                    logger.warning(f"[WARNING] Output directory exists but no markdown files found: {auto_dir}")
-            else:
-                logger.error(f"[ERROR] No MinerU output directory found: {auto_dir}")
-            
-            # If we get here, MinerU failed or produced no usable output
-            if result.returncode != 0:
-                logger.error(f"[ERROR] MinerU failed with return code {result.returncode}")
-                return None
-            else:
-                return {"message": "PDF processed but no markdown found"}
+            return self._collect_mineru_output(pdf_path, output_dir, result.returncode, log_path, cache_dir)
                 
         except subprocess.TimeoutExpired:
             logger.warning(f"[WARNING] MinerU timeout after {timeout}s, checking for output files: {pdf_path}")
@@ -494,12 +1351,221 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
         except Exception as e:
             logger.error(f"[ERROR] Error processing PDF with MinerU: {e}")
             logger.info(f"🔄 Checking for output files or trying fallback: {pdf_path}")
-            return self._check_mineru_output_or_fallback(pdf_path, output_dir)
+            return self._check_mineru_output_or_fallback(pdf_path, output_dir)
+    
+    @staticmethod
+    def _mineru_log_tail(log_path, limit=MINERU_LOG_TAIL):
+        """Last `limit` bytes of a MinerU stderr log, decoded leniently"""
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(max(0, os.path.getsize(log_path) - limit))
+                return f.read().decode('utf-8', errors='ignore')
+        except OSError:
+            return ""
+    
+    def _collect_mineru_output(self, pdf_path, output_dir, returncode, log_path, cache_dir):
+        """Read MinerU's markdown/content list for a finished run and populate the cache"""
+        # Always check for output files regardless of return code
+        # MinerU sometimes returns non-zero even when successful
+        pdf_name = Path(pdf_path).stem
+        auto_dir = Path(output_dir) / pdf_name / "auto"
+        
+        if returncode == 0:
+            logger.info("[OK] MinerU processing completed successfully")
+        else:
+            logger.warning(f"[WARNING] MinerU returned code {returncode}, but checking for output files")
+            logger.warning(f"[WARNING] MinerU stderr (tail of {log_path}): {self._mineru_log_tail(log_path)}")
+        
+        # Check for output files regardless of return code
+        scan = _scan_mineru_output(auto_dir)
+        if scan is not None:
+            logger.info(f"[OK] Found MinerU output directory: {auto_dir}")
+            md_file, content_list_file, files_created = scan
+            if md_file:
+                extracted_text = _read_text(md_file)
+                
+                # Get structured content
+                structured_content = None
+                if content_list_file:
+                    structured_content = _load_json(content_list_file)
+                
+                self._store_mineru_cache(cache_dir, md_file, content_list_file, auto_dir / "images")
+                
+                logger.info(f"[OK] Successfully extracted {len(extracted_text)} chars from MinerU")
+                return {
+                    "extracted_text": extracted_text,
+                    "structured_content": structured_content,
+                    "output_dir": str(auto_dir),
+                    "files_created": files_created
+                }
+            else:
+                logger.warning(f"[WARNING] Output directory exists but no markdown files found: {auto_dir}")
+        else:
+            logger.error(f"[ERROR] No MinerU output directory found: {auto_dir}")
+        
+        # If we get here, MinerU failed or produced no usable output
+        if returncode != 0:
+            logger.error(f"[ERROR] MinerU failed with return code {returncode}")
+            return None
+        else:
+            return {"message": "PDF processed but no markdown found"}
+    
+    async def process_pdf_with_mineru_async(self, pdf_path, output_dir, fast_text_only=False, timeout=MINERU_TIMEOUT):
+        """Run MinerU as an asyncio subprocess so several PDFs can be processed at once
+        
+        Uncached PDFs requested within MINERU_BATCH_MS of each other are handed
+        to MinerU together (see _run_mineru_items). Concurrent runs are bounded
+        by MINERU_MAX_PARALLEL; the result has the same shape as
+        process_pdf_with_mineru.
+        """
+        try:
+            if not MINERU_AVAILABLE:
+                return None
+            
+            mode = "txt" if fast_text_only else "auto"
+            
+            # Skip MinerU entirely for PDFs whose bytes were processed before
+            digest = await asyncio.to_thread(self._file_digest, pdf_path)
+            cache_dir = self._mineru_cache_dir(digest, mode)
+            cached = await asyncio.to_thread(self._load_mineru_cache, cache_dir)
+            if cached:
+                logger.info(f"[OK] Using cached MinerU output for {pdf_path}: {cache_dir}")
+                return cached
+            
+            if self._mineru_batcher is None:
+                self._mineru_batcher = MicroBatcher(self._run_mineru_items, MINERU_BATCH_MAX, MINERU_BATCH_MS)
+            return await (await self._mineru_batcher.submit((pdf_path, str(output_dir), mode, timeout, cache_dir)))
+            
+        except Exception as e:
+            logger.error(f"[ERROR] Error processing PDF with MinerU: {e}")
+            logger.info(f"🔄 Checking for output files or trying fallback: {pdf_path}")
+            return await asyncio.to_thread(self._check_mineru_output_or_fallback, pdf_path, output_dir)
+    
+    async def _run_mineru_items(self, items):
+        """Batch flush for process_pdf_with_mineru_async; returns results in input order
+        
+        Items are (pdf_path, output_dir, mode, timeout, cache_dir). Items sharing
+        output_dir, mode and timeout go through one `mineru -p <dir>` run; a
+        group of one uses the single-PDF command.
+        """
+        results = [None] * len(items)
+        groups = {}
+        for i, (_, output_dir, mode, timeout, _) in enumerate(items):
+            groups.setdefault((output_dir, mode, timeout), []).append(i)
+        
+        runs = []
+        for key, indices in groups.items():
+            batch, stems = [], set()
+            for i in indices:
+                stem = Path(items[i][0]).stem
+                if stem in stems:
+                    # MinerU names its output folder after the stem; run duplicates on their own
+                    runs.append((key, [i]))
+                else:
+                    stems.add(stem)
+                    batch.append(i)
+            runs.append((key, batch))
+        
+        async def run(key, indices):
+            output_dir, mode, timeout = key
+            entries = [(items[i][0], items[i][4]) for i in indices]
+            if len(entries) == 1:
+                pdf_path, cache_dir = entries[0]
+                out = [await self._run_mineru_single(pdf_path, cache_dir, output_dir, mode, timeout)]
+            else:
+                out = await self._run_mineru_batch(entries, output_dir, mode, timeout)
+            for i, result in zip(indices, out):
+                results[i] = result
+        
+        await asyncio.gather(*(run(key, indices) for key, indices in runs))
+        return results
+    
+    def _mineru_slot(self):
+        if self._mineru_semaphore is None:
+            self._mineru_semaphore = asyncio.Semaphore(MINERU_MAX_PARALLEL)
+        return self._mineru_semaphore
+    
+    async def _run_mineru_single(self, pdf_path, cache_dir, output_dir, mode, timeout):
+        """One MinerU run over a single uncached PDF"""
+        try:
+            self._ensure_dir(output_dir)
+            cmd = self._mineru_cmd(pdf_path, output_dir, mode)
+            
+            async with self._mineru_slot():
+                logger.info(f"📄 Processing PDF with MinerU ({mode} mode, async): {pdf_path}")
+                log_path = Path(output_dir) / f"{Path(pdf_path).stem}.mineru.log"
+                with open(log_path, 'wb') as log_file:
+                    proc = await asyncio.create_subprocess_exec(
+                        *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=log_file
+                    )
+                    try:
+                        await asyncio.wait_for(proc.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+                        await proc.wait()
+                        logger.warning(f"[WARNING] MinerU timeout after {timeout}s, checking for output files: {pdf_path}")
+                        return await asyncio.to_thread(self._check_mineru_output_or_fallback, pdf_path, output_dir)
+            
+            return await asyncio.to_thread(
+                self._collect_mineru_output, pdf_path, output_dir, proc.returncode, log_path, cache_dir
+            )
+            
+        except Exception as e:
+            logger.error(f"[ERROR] Error processing PDF with MinerU: {e}")
+            logger.info(f"🔄 Checking for output files or trying fallback: {pdf_path}")
+            return await asyncio.to_thread(self._check_mineru_output_or_fallback, pdf_path, output_dir)
+    
+    async def _run_mineru_batch(self, entries, output_dir, mode, timeout):
+        """One MinerU run over a directory of (pdf_path, cache_dir) entries; returns per-PDF results"""
+        try:
+            self._ensure_dir(output_dir)
+            batch_dir = Path(tempfile.mkdtemp(prefix=".mineru_batch_", dir=output_dir))
+        except OSError as e:
+            logger.error(f"[ERROR] Could not create MinerU batch directory: {e}")
+            return [None] * len(entries)
+        
+        async def fallback_all():
+            return await asyncio.gather(*(
+                asyncio.to_thread(self._check_mineru_output_or_fallback, pdf_path, output_dir)
+                for pdf_path, _ in entries
+            ))
+        
+        try:
+            for pdf_path, _ in entries:
+                link = batch_dir / Path(pdf_path).name
+                try:
+                    os.symlink(Path(pdf_path).resolve(), link)
+                except OSError:
+                    shutil.copyfile(pdf_path, link)
+            
+            cmd = self._mineru_cmd(batch_dir, output_dir, mode)
+            log_path = Path(output_dir) / f"{batch_dir.name}.mineru.log"
+            batch_timeout = timeout * len(entries)
+            
+            async with self._mineru_slot():
+                logger.info(f"📄 Processing {len(entries)} PDFs in one MinerU run ({mode} mode): {batch_dir}")
+                with open(log_path, 'wb') as log_file:
+                    proc = await asyncio.create_subprocess_exec(
+                        *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=log_file
+                    )
+                    try:
+                        await asyncio.wait_for(proc.wait(), timeout=batch_timeout)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+                        await proc.wait()
+                        logger.warning(f"[WARNING] MinerU batch timeout after {batch_timeout}s, checking for output files")
+                        return await fallback_all()
+            
+            return await asyncio.gather(*(
+                asyncio.to_thread(self._collect_mineru_output, pdf_path, output_dir, proc.returncode, log_path, cache_dir)
+                for pdf_path, cache_dir in entries
+            ))
+            
+        except Exception as e:
+            logger.error(f"[ERROR] Error processing PDF batch with MinerU: {e}")
+            return await fallback_all()
         finally:
-            # Force memory cleanup after each PDF to prevent accumulation
-            if low_memory:
-                gc.collect()
-                time.sleep(1)  # Brief pause to allow memory cleanup
+            shutil.rmtree(batch_dir, ignore_errors=True)
     
     def _check_mineru_output_or_fallback(self, pdf_path, output_dir):
         """Check if MinerU produced output despite timeout, otherwise fallback"""
@@ -507,27 +1573,28 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             pdf_name = Path(pdf_path).stem
             expected_output_dir = Path(output_dir) / pdf_name / "auto"
             
-            # Check if MinerU actually produced output
+            # Check if MinerU actually produced output (one directory listing instead of per-file probes)
             markdown_file = expected_output_dir / f"{pdf_name}.md"
             content_list_file = expected_output_dir / f"{pdf_name}_content_list.json"
+            images_dir = expected_output_dir / "images"
+            scan = _scan_mineru_output(expected_output_dir)
+            present = set(scan[2]) if scan else set()
             
-            if markdown_file.exists() and content_list_file.exists():
+            if str(markdown_file) in present and str(content_list_file) in present:
                 logger.info(f"[OK] Found MinerU output despite timeout: {pdf_name}")
                 
                 # Read the rich content
-                markdown_content = markdown_file.read_text(encoding='utf-8', errors='ignore')
+                markdown_content = _read_text(markdown_file, errors='ignore')
                 
                 # Try to read content list for multimodal elements
                 try:
-                    import json
-                    with open(content_list_file, 'r', encoding='utf-8') as f:
-                        content_list = json.load(f)
+                    content_list = _load_json(content_list_file)
                     
                     return {
                         "extracted_text": markdown_content,
                         "content_list": content_list,
                         "extraction_method": "RAGAnything_MinerU_Success_After_Timeout",
-                        "images_dir": str(expected_output_dir / "images") if (expected_output_dir / "images").exists() else None
+                        "images_dir": str(images_dir) if str(images_dir) in present else None
                     }
                 except Exception as json_e:
                     logger.warning(f"[WARNING] Could not read content list, using markdown only: {json_e}")
@@ -545,179 +1612,92 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
     
     def _create_enhanced_text_from_content_list(self, base_text, content_list, source_url, images_base_dir=None, upload_to_storage=True):
         """Create enhanced text from MinerU content list with multimodal descriptions and Supabase Storage URLs"""
-        enhanced_sections = [f"📄 SOURCE DOCUMENT: {source_url}"]
-        enhanced_sections.append(f"🔗 ORIGINAL URL: {source_url}")
-        enhanced_sections.append("\nCONTENT:\n")
-        
-        # Setup storage bucket if uploading images
-        bucket_name = None
-        if upload_to_storage:
-            bucket_name = self.setup_storage_bucket("rag-images")
-        
-        # Add base text first
-        if base_text:
-            enhanced_sections.append(base_text)
+        return "".join(self._iter_enhanced_text_from_content_list(
+            base_text, content_list, source_url, images_base_dir=images_base_dir, upload_to_storage=upload_to_storage
+        ))
+    
+    def _iter_enhanced_text_from_content_list(self, base_text, content_list, source_url, images_base_dir=None, upload_to_storage=True):
+        """Yield the enhanced text section by section, for streaming to insert_text_to_lightrag"""
+        # Convert the content list to typed items once
+        items = [CLItem.from_dict(item) for item in content_list]
+        uploaded_urls = self._content_list_image_urls(items, images_base_dir, upload_to_storage)
+        yield from _enhanced_text_sections(base_text, items, source_url, images_base_dir, uploaded_urls)
+    
+    def _content_list_image_urls(self, items, images_base_dir, upload_to_storage=True):
+        """Upload the content list's images to Supabase Storage; returns {img_path: public_url}"""
+        if not upload_to_storage or not images_base_dir:
+            return {}
+        bucket_name = self.setup_storage_bucket("rag-images")
+        if not bucket_name:
+            return {}
+        return self._upload_content_list_images(items, bucket_name, images_base_dir)
+    
+    def _upload_content_list_images(self, items, bucket_name, images_base_dir):
+        """Upload the images referenced by content-list items, returning {img_path: public_url}"""
+        local_paths = {}
+        for item in items:
+            img_path = item.img_path if item.type == "image" else ""
+            if not img_path or img_path in local_paths:
+                continue
+            # Fix path resolution - img_path already includes "images/" so don't double it
+            if img_path.startswith("images/"):
+                # Remove "images/" prefix since images_base_dir already points to images folder
+                full_local_path = Path(images_base_dir) / img_path[7:]
+            else:
+                full_local_path = Path(images_base_dir) / img_path
+            
+            if full_local_path.exists():
+                local_paths[img_path] = full_local_path
+            else:
+                logger.warning(f"[WARNING] Image file not found: {full_local_path}")
         
-        # Process content list for multimodal elements with Supabase Storage URLs
-        tables_found = []
-        images_found = []
+        uploaded_urls = {}
+        if not local_paths:
+            return uploaded_urls
         
-        for item in content_list:
-            content_type = item.get("type", "")
-            
-            if content_type == "table":
-                table_html = item.get("table_body", "")
-                table_caption = item.get("table_caption", [""])[0] if item.get("table_caption") else ""
-                
-                # Convert HTML table to readable text
-                table_text = self._html_table_to_text(table_html)
-                table_desc = f"\n\n📊 TABLE: {table_caption}\n{table_text}\n"
-                
-                enhanced_sections.append(table_desc)
-                tables_found.append(table_caption or f"Table {len(tables_found) + 1}")
-                
-            elif content_type == "image":
-                img_caption = item.get("img_caption", [""])[0] if item.get("img_caption") else ""
-                img_path = item.get("img_path", "")
-                
-                # Upload image to Supabase Storage and get public URL
-                public_url = None
-                if upload_to_storage and bucket_name and images_base_dir and img_path:
-                    # Fix path resolution - img_path already includes "images/" so don't double it
-                    if img_path.startswith("images/"):
-                        # Remove "images/" prefix since images_base_dir already points to images folder
-                        img_filename = img_path[7:]  # Remove "images/" prefix
-                        full_local_path = Path(images_base_dir) / img_filename
-                    else:
-                        full_local_path = Path(images_base_dir) / img_path
-                    
-                    if full_local_path.exists():
-                        # Create folder name from source URL for organization
-                        url_hash = str(hash(source_url))[-8:]  # Use last 8 chars of hash for uniqueness
-                        folder_name = f"documents/{url_hash}"
-                        public_url = self.upload_image_to_storage(
-                            str(full_local_path), 
-                            bucket_name, 
-                            folder_name
-                        )
-                        logger.info(f"[OK] Uploaded image to Supabase: {img_path} -> {public_url}")
-                    else:
-                        logger.warning(f"[WARNING] Image file not found: {full_local_path}")
-                
-                # Create image description with public URL
+        with ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS) as executor:
+            futures = {
+                executor.submit(self.upload_image_deduplicated, str(path), bucket_name): img_path
+                for img_path, path in local_paths.items()
+            }
+            for future in as_completed(futures):
+                img_path = futures[future]
+                public_url = future.result()
                 if public_url:
-                    img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📷 Public URL: {public_url}\n📁 Original Path: {img_path}\n"
-                    image_url = public_url
-                elif images_base_dir and img_path:
-                    # Fallback to local path if upload failed
-                    local_url = f"file:///{Path(images_base_dir) / img_path}"
-                    img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📁 Local URL: {local_url}\n📁 Path: {img_path}\n"
-                    image_url = local_url
-                else:
-                    img_desc = f"\n\n🖼️ IMAGE: {img_caption}\n📁 Location: {img_path}\n"
-                    image_url = img_path
-                
-                enhanced_sections.append(img_desc)
-                images_found.append({
-                    "caption": img_caption or f"Image {len(images_found) + 1}",
-                    "path": img_path,
-                    "url": image_url,
-                    "public": bool(public_url)
-                })
-                
-            elif content_type == "text" and item.get("text"):
-                # Additional text content
-                text_content = item.get("text", "").strip()
-                if text_content and text_content not in base_text:
-                    enhanced_sections.append(f"\n{text_content}")
-        
-        # Add comprehensive summary with URLs
-        if tables_found or images_found:
-            summary = "\n\n📋 MULTIMODAL CONTENT SUMMARY:\n"
-            summary += f"🔗 Source: {source_url}\n"
-            
-            if tables_found:
-                summary += f"📊 Tables ({len(tables_found)}): {', '.join(tables_found)}\n"
-            if images_found:
-                summary += f"🖼️ Images ({len(images_found)}):\n"
-                public_images = [img for img in images_found if img.get('public')]
-                if public_images:
-                    summary += f"   📷 Public Images ({len(public_images)}):\n"
-                    for i, img in enumerate(public_images, 1):
-                        summary += f"      {i}. {img['caption']} - {img['url']}\n"
-                local_images = [img for img in images_found if not img.get('public')]
-                if local_images:
-                    summary += f"   📁 Local Images ({len(local_images)}):\n"
-                    for i, img in enumerate(local_images, 1):
-                        summary += f"      {i}. {img['caption']} - {img.get('path', 'N/A')}\n"
-            
-            enhanced_sections.append(summary)
-        
-        # Add reference footer
-        enhanced_sections.append(f"\n\n📚 REFERENCE: For full technical details, see {source_url}")
-        
-        return "\n".join(enhanced_sections)
-    
-    def _html_table_to_text(self, html_table):
-        """Convert HTML table to readable text format"""
-        try:
-            # Simple HTML table parsing
-            import re
-            
-            # Remove HTML tags and extract cell content
-            rows = re.findall(r'<tr[^>]*>(.*?)</tr>', html_table, re.DOTALL | re.IGNORECASE)
-            text_rows = []
-            
-            for row in rows:
-                cells = re.findall(r'<t[hd][^>]*>(.*?)</t[hd]>', row, re.DOTALL | re.IGNORECASE)
-                # Clean cell content
-                clean_cells = []
-                for cell in cells:
-                    clean_cell = re.sub(r'<[^>]+>', '', cell).strip()
-                    clean_cells.append(clean_cell)
-                
-                if clean_cells:
-                    text_rows.append(" | ".join(clean_cells))
-            
-            return "\n".join(text_rows) if text_rows else html_table
-            
-        except Exception as e:
-            logger.warning(f"[WARNING] Could not parse HTML table: {e}")
-            return html_table
+                    uploaded_urls[img_path] = public_url
+                    logger.info(f"[OK] Uploaded image to Supabase: {img_path} -> {public_url}")
+        
+        return uploaded_urls
     
     def _fallback_text_extraction(self, pdf_path):
         """Fallback simple text extraction when MinerU fails"""
-        try:
-            import PyPDF2
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                logger.info(f"[OK] Fallback extraction successful: {len(text)} characters")
-                return {
-                    "extracted_text": text,
-                    "extraction_method": "PyPDF2_fallback",
-                    "output_dir": None,
-                    "files_created": []
-                }
-        except ImportError:
-            logger.warning("[WARNING] PyPDF2 not available, trying basic file read")
+        for method, extract in PDF_TEXT_EXTRACTORS:
             try:
-                # Very basic fallback - just return filename info
-                filename = Path(pdf_path).name
-                return {
-                    "extracted_text": f"PDF Document: {filename}\nProcessed with basic extraction due to processing issues.",
-                    "extraction_method": "basic_fallback",
-                    "output_dir": None,
-                    "files_created": []
-                }
+                text = extract(pdf_path)
             except Exception as e:
-                logger.error(f"[ERROR] All extraction methods failed: {e}")
-                return None
+                logger.warning(f"[WARNING] {method} extraction failed: {e}")
+                continue
+            
+            logger.info(f"[OK] Fallback extraction successful ({method}): {len(text)} characters")
+            return {
+                "extracted_text": text,
+                "extraction_method": f"{method}_fallback",
+                "output_dir": None,
+                "files_created": []
+            }
+        
+        logger.warning("[WARNING] No PDF text extractor available, trying basic file read")
+        try:
+            # Very basic fallback - just return filename info
+            filename = Path(pdf_path).name
+            return {
+                "extracted_text": f"PDF Document: {filename}\nProcessed with basic extraction due to processing issues.",
+                "extraction_method": "basic_fallback",
+                "output_dir": None,
+                "files_created": []
+            }
         except Exception as e:
-            logger.error(f"[ERROR] Fallback extraction failed: {e}")
+            logger.error(f"[ERROR] All extraction methods failed: {e}")
             return None
     
     async def start_async_mineru_processing(self, pdf_path, output_dir, doc_id, fast_text_only=False, low_memory=True):
@@ -730,33 +1710,23 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             logger.info(f"🚀 Starting async MinerU processing ({mode} mode): {pdf_path}")
             
             # Create output directory
-            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(output_dir)
             
             # Create unique process ID
             process_id = f"mineru_{doc_id}_{uuid.uuid4().hex[:8]}"
             
             # Run MinerU command with optimized RAGAnything settings
-            cmd = [
-                "mineru",
-                "-p", str(pdf_path),
-                "-o", str(output_dir),
-                "-m", mode,
-                "-l", "en",
-                "-d", "cpu",
-                "-b", "pipeline",
-                "-f", "true",
-                "-t", "true"
-            ]
+            cmd = self._mineru_cmd(pdf_path, output_dir, mode)
             
             logger.info(f"🔧 Starting MinerU async process: {process_id}")
             
-            # Start the process without waiting
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                text=True
-            )
+            # Start the process without waiting; stderr goes to a log file so the
+            # unread pipe can't fill up and stall MinerU
+            log_path = Path(output_dir) / f"{process_id}.log"
+            with open(log_path, 'wb') as log_file:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=log_file
+                )
             
             # Store process info for tracking
             process_info = {
@@ -765,9 +1735,12 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 "output_dir": output_dir,
                 "doc_id": doc_id,
                 "process": process,
+                "done": asyncio.ensure_future(process.wait()),  # resolves with the exit code
                 "started_at": time.time(),
                 "status": "running",
-                "cmd": cmd
+                "cmd": cmd,
+                "log_path": str(log_path),
+                "auto_dir": Path(output_dir) / Path(pdf_path).stem / "auto"  # where MinerU writes its output
             }
             
             logger.info(f"[OK] MinerU process started async: {process_id} (PID: {process.pid})")
@@ -782,11 +1755,9 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
         try:
             process_id = process_info["process_id"]
             process = process_info["process"]
-            pdf_path = process_info["pdf_path"]
-            output_dir = process_info["output_dir"]
             
             # Check if process is still running
-            poll_result = process.poll()
+            poll_result = process.returncode
             
             if poll_result is None:
                 # Process is still running
@@ -797,57 +1768,14 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                     "elapsed_seconds": elapsed
                 }
             
-            # Process has finished
-            stdout, stderr = process.communicate()
-            
-            logger.info(f"[OK] MinerU process {process_id} completed with return code: {poll_result}")
-            
-            # Check for output files regardless of return code
-            pdf_name = Path(pdf_path).stem
-            auto_dir = Path(output_dir) / pdf_name / "auto"
-            
-            if auto_dir.exists():
-                logger.info(f"[OK] Found MinerU output directory: {auto_dir}")
-                
-                # Get markdown content
-                md_files = list(auto_dir.glob("*.md"))
-                if md_files:
-                    with open(md_files[0], 'r', encoding='utf-8') as f:
-                        extracted_text = f.read()
-                    
-                    # Get structured content
-                    content_list_files = list(auto_dir.glob("*_content_list.json"))
-                    structured_content = None
-                    if content_list_files:
-                        with open(content_list_files[0], 'r', encoding='utf-8') as f:
-                            structured_content = json.load(f)
-                    
-                    logger.info(f"[OK] Successfully extracted {len(extracted_text)} chars from async MinerU process {process_id}")
-                    
-                    return {
-                        "status": "completed",
-                        "process_id": process_id,
-                        "success": True,
-                        "extracted_text": extracted_text,
-                        "structured_content": structured_content,
-                        "output_dir": str(auto_dir),
-                        "files_created": [str(f) for f in auto_dir.glob("*")],
-                        "return_code": poll_result,
-                        "extraction_method": "RAGAnything_MinerU_Async"
-                    }
-                else:
-                    logger.warning(f"[WARNING] Output directory exists but no markdown files found: {auto_dir}")
-            
-            # Process completed but no usable output found
-            logger.error(f"[ERROR] MinerU process {process_id} completed but no usable output found")
-            return {
-                "status": "completed",
-                "process_id": process_id,
-                "success": False,
-                "error": f"No output found (return code: {poll_result})",
-                "stderr": stderr,
-                "return_code": poll_result
-            }
+            # A finished process is only scanned once; later (or concurrent) polls share the result
+            if "completion" not in process_info:
+                logger.info(f"[OK] MinerU process {process_id} completed with return code: {poll_result}")
+                # Reading and parsing the output is blocking file I/O, so keep it off the event loop
+                process_info["completion"] = asyncio.ensure_future(
+                    asyncio.to_thread(self._read_async_mineru_output, process_info, poll_result)
+                )
+            return await asyncio.shield(process_info["completion"])
             
         except Exception as e:
             logger.error(f"[ERROR] Error checking MinerU process completion: {e}")
@@ -857,10 +1785,58 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 "error": str(e)
             }
     
-    async def process_pdf_async_with_polling(self, pdf_path, output_dir, doc_id, fast_text_only=False, low_memory=True, poll_interval=30, max_wait_time=1200):
-        """Process PDF with MinerU asynchronously, polling for completion"""
+    def _read_async_mineru_output(self, process_info, return_code):
+        """Collect the output of a finished background MinerU process"""
+        process_id = process_info["process_id"]
+        
+        # Check for output files regardless of return code
+        auto_dir = process_info.get("auto_dir") or Path(process_info["output_dir"]) / Path(process_info["pdf_path"]).stem / "auto"
+        
+        scan = _scan_mineru_output(auto_dir)
+        if scan is not None:
+            logger.info(f"[OK] Found MinerU output directory: {auto_dir}")
+            md_file, content_list_file, files_created = scan
+            
+            # Get markdown content
+            if md_file:
+                extracted_text = _read_text(md_file)
+                
+                # Get structured content
+                structured_content = None
+                if content_list_file:
+                    structured_content = _load_json(content_list_file)
+                
+                logger.info(f"[OK] Successfully extracted {len(extracted_text)} chars from async MinerU process {process_id}")
+                
+                return {
+                    "status": "completed",
+                    "process_id": process_id,
+                    "success": True,
+                    "extracted_text": extracted_text,
+                    "structured_content": structured_content,
+                    "output_dir": str(auto_dir),
+                    "files_created": files_created,
+                    "return_code": return_code,
+                    "extraction_method": "RAGAnything_MinerU_Async"
+                }
+            else:
+                logger.warning(f"[WARNING] Output directory exists but no markdown files found: {auto_dir}")
+        
+        # Process completed but no usable output found
+        logger.error(f"[ERROR] MinerU process {process_id} completed but no usable output found")
+        return {
+            "status": "completed",
+            "process_id": process_id,
+            "success": False,
+            "error": f"No output found (return code: {return_code})",
+            "stderr": self._mineru_log_tail(process_info["log_path"]) if "log_path" in process_info else "",
+            "return_code": return_code
+        }
+    
+    async def process_pdf_async_with_polling(self, pdf_path, output_dir, doc_id, fast_text_only=False, low_memory=True, max_wait_time=1200):
+        """Process PDF with MinerU asynchronously, waiting for the process to exit"""
         try:
-            logger.info(f"🔄 Starting async PDF processing with polling: {pdf_path}")
+            logger.info(f"🔄 Starting async PDF processing: {pdf_path}")
             
             # Start the MinerU process
             process_info = await self.start_async_mineru_processing(
@@ -874,96 +1850,151 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             process_id = process_info["process_id"]
             start_time = time.time()
             
-            logger.info(f"⏱️ Polling for completion every {poll_interval}s (max wait: {max_wait_time}s)")
+            logger.info(f"⏱️ Waiting for MinerU process {process_id} (max wait: {max_wait_time}s)")
             
-            # Poll for completion
-            while True:
-                # Check if process is complete
-                result = await self.check_mineru_process_completion(process_info)
-                
-                if result["status"] == "completed":
-                    if result["success"]:
-                        logger.info(f"[OK] Async MinerU processing completed successfully: {process_id}")
-                        return {
-                            "extracted_text": result["extracted_text"],
-                            "structured_content": result.get("structured_content"),
-                            "output_dir": result["output_dir"],
-                            "files_created": result["files_created"],
-                            "extraction_method": result["extraction_method"],
-                            "process_id": process_id,
-                            "processing_time": time.time() - start_time
-                        }
-                    else:
-                        logger.error(f"[ERROR] Async MinerU processing failed: {result.get('error', 'Unknown error')}")
-                        return None
-                
-                elif result["status"] == "error":
-                    logger.error(f"[ERROR] Error in async MinerU processing: {result.get('error', 'Unknown error')}")
-                    return None
-                
-                # Check timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(process_info["done"]), timeout=max_wait_time)
+            except asyncio.TimeoutError:
                 elapsed = time.time() - start_time
-                if elapsed > max_wait_time:
-                    logger.warning(f"[WARNING] Async MinerU processing timed out after {elapsed:.1f}s")
-                    
-                    # Try to terminate the process
+                logger.warning(f"[WARNING] Async MinerU processing timed out after {elapsed:.1f}s")
+                
+                # Try to terminate the process, giving it time to exit before killing it
+                try:
+                    process_info["process"].terminate()
                     try:
-                        process_info["process"].terminate()
-                        await asyncio.sleep(5)  # Give it time to terminate
-                        if process_info["process"].poll() is None:
-                            process_info["process"].kill()
-                    except:
-                        pass
-                    
-                    # Check if we got partial results despite timeout
-                    final_result = await self.check_mineru_process_completion(process_info)
-                    if final_result.get("success"):
-                        logger.info(f"[OK] Got results from timed-out MinerU process: {process_id}")
-                        return {
-                            "extracted_text": final_result["extracted_text"],
-                            "structured_content": final_result.get("structured_content"),
-                            "output_dir": final_result["output_dir"],
-                            "files_created": final_result["files_created"],
-                            "extraction_method": "RAGAnything_MinerU_Async_Timeout_Success",
-                            "process_id": process_id,
-                            "processing_time": elapsed
-                        }
-                    
-                    return None
+                        await asyncio.wait_for(asyncio.shield(process_info["done"]), timeout=5)
+                    except asyncio.TimeoutError:
+                        process_info["process"].kill()
+                        await process_info["done"]
+                except ProcessLookupError:
+                    pass
+                
+                # Check if we got partial results despite timeout
+                final_result = await self.check_mineru_process_completion(process_info)
+                if final_result.get("success"):
+                    logger.info(f"[OK] Got results from timed-out MinerU process: {process_id}")
+                    return {
+                        "extracted_text": final_result["extracted_text"],
+                        "structured_content": final_result.get("structured_content"),
+                        "output_dir": final_result["output_dir"],
+                        "files_created": final_result["files_created"],
+                        "extraction_method": "RAGAnything_MinerU_Async_Timeout_Success",
+                        "process_id": process_id,
+                        "processing_time": elapsed
+                    }
                 
-                # Still running, wait before next poll
-                logger.info(f"⏳ MinerU process {process_id} still running ({elapsed:.1f}s elapsed)")
-                await asyncio.sleep(poll_interval)
+                return None
+            
+            result = await self.check_mineru_process_completion(process_info)
+            
+            if result["status"] == "completed" and result["success"]:
+                logger.info(f"[OK] Async MinerU processing completed successfully: {process_id}")
+                return {
+                    "extracted_text": result["extracted_text"],
+                    "structured_content": result.get("structured_content"),
+                    "output_dir": result["output_dir"],
+                    "files_created": result["files_created"],
+                    "extraction_method": result["extraction_method"],
+                    "process_id": process_id,
+                    "processing_time": time.time() - start_time
+                }
+            
+            logger.error(f"[ERROR] Async MinerU processing failed: {result.get('error', 'Unknown error')}")
+            return None
             
         except Exception as e:
-            logger.error(f"[ERROR] Error in async PDF processing with polling: {e}")
+            logger.error(f"[ERROR] Error in async PDF processing: {e}")
             return None
     
-    async def scrape_page_content(self, url):
-        """Scrape web page content"""
+    @staticmethod
+    def _parse_page_html(html):
+        """Extract title and whitespace-collapsed text from page HTML"""
+        if SELECTOLAX_AVAILABLE:
+            tree = HTMLParser(html)
+            for node in tree.css("script, style"):
+                node.decompose()
+            
+            title_node = tree.css_first("title")
+            title = title_node.text() if title_node else "Untitled"
+            text = tree.body.text(separator=" ") if tree.body else ""
+            return title, " ".join(text.split())
+        
+        soup = BeautifulSoup(html, BS4_PARSER)
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        title = soup.title.string if soup.title else "Untitled"
+        return title, " ".join(soup.get_text(separator=" ").split())
+    
+    def _get_cached_page(self, url):
+        """Cached (etag, last_modified, result) for url, from memory or disk"""
+        entry = self._page_cache.get(url)
+        if entry is not None:
+            self._page_cache.move_to_end(url)
+            return entry
+        if self._page_disk_cache is not None:
+            entry = self._page_disk_cache.get(url)
+            if entry is not None:
+                self._put_cached_page(url, entry, persist=False)
+        return entry
+    
+    def _put_cached_page(self, url, entry, persist=True):
+        self._page_cache[url] = entry
+        self._page_cache.move_to_end(url)
+        while len(self._page_cache) > PAGE_CACHE_SIZE:
+            self._page_cache.popitem(last=False)
+        if persist and self._page_disk_cache is not None:
+            self._page_disk_cache.set(url, entry)
+    
+    async def scrape_page_content(self, url, validators=None):
+        """Scrape web page content, revalidating cached pages with a conditional GET
+        
+        validators is an optional (etag, last_modified) pair, e.g. stored on the
+        page row, used when the page is not cached locally. A 304 returns a
+        result with "not_modified" set (and no content if nothing was cached).
+        """
         try:
             logger.info(f"🌐 Scraping page: {url}")
             
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
+            cached = self._get_cached_page(url)
+            headers = {}
+            if cached is not None:
+                validators = cached[:2]
+            if validators:
+                etag, last_modified = validators
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+            
+            async def read_page(response):
+                if response.status == 304:
+                    return None
+                return response.headers.get("ETag"), response.headers.get("Last-Modified"), await response.read()
             
-            title = soup.title.string if soup.title else "Untitled"
-            text = soup.get_text()
+            fetched = await self._fetch_with_retry(url, 30, read_page, headers=headers or None)
+            if fetched is None:
+                if cached is None:
+                    logger.info(f"[OK] Page not modified: {url}")
+                    return {"title": None, "content": None, "url": url, "not_modified": True}
+                logger.info(f"[OK] Page not modified, using cached content: {url}")
+                return {**cached[2], "not_modified": True}
             
-            # Clean text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            clean_text = ' '.join(chunk for chunk in chunks if chunk)
+            etag, last_modified, html = fetched
+            # HTML parsing is CPU-bound; keep it off the event loop
+            title, clean_text = await asyncio.to_thread(self._parse_page_html, html)
             
-            return {
+            result = {
                 "title": title,
                 "content": clean_text,
-                "url": url
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified
             }
+            # Only pages the server can revalidate are worth caching
+            if etag or last_modified:
+                self._put_cached_page(url, (etag, last_modified, result))
+            return result
             
         except Exception as e:
             logger.error(f"[ERROR] Error scraping page {url}: {e}")
@@ -974,18 +2005,13 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
         try:
             logger.info(f"📄 Downloading and processing datasheet: {datasheet_url}")
             
-            response = requests.get(datasheet_url, timeout=300)
-            response.raise_for_status()
-            
-            # Save to temp file
+            # Stream to disk instead of buffering the whole PDF in memory
             pdf_filename = datasheet_url.split('/')[-1]
             temp_path = Path(output_dir) / pdf_filename
-            
-            with open(temp_path, 'wb') as f:
-                f.write(response.content)
+            await self._download_file(datasheet_url, temp_path)
             
             # Process with MinerU (use low-memory mode for better hardware compatibility)
-            extraction_result = self.process_pdf_with_mineru(temp_path, output_dir, fast_text_only=False, low_memory=True)
+            extraction_result = await self.process_pdf_with_mineru_async(temp_path, output_dir, fast_text_only=False)
             
             if extraction_result:
                 logger.info(f"[OK] Datasheet processed: {len(extraction_result.get('extracted_text', ''))} characters extracted")
@@ -1007,112 +2033,204 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
     async def download_and_start_async_datasheet_processing(self, datasheet_url, output_dir, doc_id):
         """Download PDF datasheet and start async MinerU processing"""
         try:
-            logger.info(f"📄 Downloading datasheet for async processing: {datasheet_url}")
-            
-            response = requests.get(datasheet_url, timeout=300)
-            response.raise_for_status()
-            
-            # Save to temp file
-            pdf_filename = datasheet_url.split('/')[-1]
-            temp_path = Path(output_dir) / pdf_filename
-            
-            with open(temp_path, 'wb') as f:
-                f.write(response.content)
-            
-            logger.info(f"[OK] Downloaded datasheet: {temp_path}")
-            
-            # Start async MinerU processing
-            process_info = await self.start_async_mineru_processing(
-                temp_path, output_dir, doc_id, fast_text_only=False, low_memory=True
-            )
-            
-            if process_info:
-                # Store in active processes
-                self.active_processes[process_info["process_id"]] = {
-                    **process_info,
-                    "datasheet_url": datasheet_url,
-                    "local_file": str(temp_path)
-                }
-                
-                logger.info(f"[OK] Started async MinerU processing for datasheet: {process_info['process_id']}")
-                return {
-                    "process_id": process_info["process_id"],
-                    "datasheet_url": datasheet_url,
-                    "local_file": str(temp_path),
-                    "status": "processing"
-                }
-            else:
-                logger.error(f"[ERROR] Failed to start async processing for datasheet: {datasheet_url}")
-                return None
+            temp_path = await self._download_datasheet(datasheet_url, output_dir)
+            return await self._start_datasheet_processing(datasheet_url, temp_path, output_dir, doc_id)
                 
         except Exception as e:
             logger.error(f"[ERROR] Error starting async datasheet processing {datasheet_url}: {e}")
             return None
     
+    async def _download_datasheet(self, datasheet_url, output_dir):
+        """Download a datasheet PDF into output_dir and return its local path"""
+        logger.info(f"📄 Downloading datasheet for async processing: {datasheet_url}")
+        
+        # Stream to disk instead of buffering the whole PDF in memory
+        pdf_filename = datasheet_url.split('/')[-1]
+        temp_path = Path(output_dir) / pdf_filename
+        await self._download_file(datasheet_url, temp_path)
+        
+        logger.info(f"[OK] Downloaded datasheet: {temp_path}")
+        return temp_path
+    
+    async def _start_datasheet_processing(self, datasheet_url, temp_path, output_dir, doc_id):
+        """Start async MinerU processing for a downloaded datasheet and track it for background upload"""
+        process_info = await self.start_async_mineru_processing(
+            temp_path, output_dir, doc_id, fast_text_only=False, low_memory=True
+        )
+        
+        if not process_info:
+            logger.error(f"[ERROR] Failed to start async processing for datasheet: {datasheet_url}")
+            return None
+        
+        # Store in active processes; the background polling task uploads it once MinerU exits
+        self.active_processes[process_info["process_id"]] = {
+            **process_info,
+            "datasheet_url": datasheet_url,
+            "local_file": str(temp_path)
+        }
+        # Queue the process for upload the moment it exits
+        process_info["done"].add_done_callback(
+            lambda _, process_id=process_info["process_id"]: self._completed_q.put_nowait(process_id)
+        )
+        
+        logger.info(f"[OK] Started async MinerU processing for datasheet: {process_info['process_id']}")
+        return {
+            "process_id": process_info["process_id"],
+            "datasheet_url": datasheet_url,
+            "local_file": str(temp_path),
+            "status": "processing"
+        }
+    
+    async def _start_datasheets_pipelined(self, datasheets, output_dir, page_id):
+        """Download datasheets and start MinerU on each as soon as its PDF lands
+        
+        Concurrent downloads feed a MinerU starter through a bounded queue, so
+        PDFs keep downloading while earlier ones are already being extracted.
+        Uploads are handled by the background polling task.
+        """
+        download_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        started_processes = []
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent_datasheets)
+        
+        async def download_one(i, datasheet):
+            if self._load_ingested(f"page_{page_id}_datasheet_{i}", datasheet["url"]) is not None:
+                logger.info(f"[OK] Datasheet {i} already ingested, skipping download and MinerU: {datasheet['url']}")
+                return
+            async with semaphore:
+                try:
+                    temp_path = await self._download_datasheet(datasheet["url"], output_dir)
+                except Exception as e:
+                    logger.warning(f"[WARNING] Failed to download datasheet {i}: {e}")
+                    return
+            await download_q.put((i, datasheet, temp_path))
+        
+        async def download_stage():
+            # Downloads overlap each other; each PDF is queued as soon as it lands
+            try:
+                await asyncio.gather(*(download_one(i, ds) for i, ds in enumerate(datasheets, 1)))
+            finally:
+                await download_q.put(None)
+        
+        async def mineru_stage():
+            while (item := await download_q.get()) is not None:
+                i, datasheet, temp_path = item
+                try:
+                    async_result = await self._start_datasheet_processing(
+                        datasheet["url"], temp_path, output_dir, f"page_{page_id}_datasheet_{i}"
+                    )
+                except Exception as e:
+                    logger.error(f"[ERROR] Error starting async datasheet processing {datasheet['url']}: {e}")
+                    async_result = None
+                
+                if async_result:
+                    started_processes.append({
+                        "index": i,
+                        "process_info": async_result,
+                        "datasheet": datasheet
+                    })
+                    logger.info(f"[OK] Started async processing for datasheet {i}: {async_result['process_id']}")
+                else:
+                    logger.warning(f"[WARNING] Failed to start async processing for datasheet {i}")
+        
+        await asyncio.gather(download_stage(), mineru_stage())
+        return started_processes
+    
     async def check_and_upload_completed_processes(self):
         """Check active processes and upload completed ones to LightRAG"""
         try:
-            completed_uploads = []
-            processes_to_remove = []
-            
-            for process_id, process_data in list(self.active_processes.items()):
-                # Check if process is complete
-                result = await self.check_mineru_process_completion(process_data)
-                
-                if result["status"] == "completed":
-                    if result["success"]:
-                        logger.info(f"[OK] MinerU process completed, uploading to LightRAG: {process_id}")
-                        
-                        # Validate that we have actual content
-                        extracted_text = result.get("extracted_text", "")
-                        if not extracted_text or len(extracted_text.strip()) < 50:
-                            logger.warning(f"[WARNING] Process {process_id} completed but content is too short ({len(extracted_text)} chars)")
-                            processes_to_remove.append(process_id)
-                            continue
-                        
-                        # Create multimodal content and upload
-                        pdf_result = {
-                            "extracted_text": extracted_text,
-                            "structured_content": result.get("structured_content"),
-                            "output_dir": result["output_dir"],
-                            "files_created": result["files_created"],
-                            "extraction_method": result["extraction_method"]
-                        }
-                        
-                        multimodal_content = self._create_multimodal_content(pdf_result, process_data["doc_id"])
-                        upload_result = self._upload_multimodal_file(multimodal_content, process_data["doc_id"])
-                        
-                        if upload_result:
-                            completed_uploads.append({
-                                "process_id": process_id,
-                                "doc_id": process_data["doc_id"],
-                                "datasheet_url": process_data["datasheet_url"],
-                                "upload_result": upload_result,
-                                "extraction_result": pdf_result,
-                                "processing_time": time.time() - process_data["started_at"]
-                            })
-                            logger.info(f"[OK] Successfully uploaded completed MinerU process: {process_id}")
-                        else:
-                            logger.error(f"[ERROR] Failed to upload completed process: {process_id}")
-                    else:
-                        logger.error(f"[ERROR] MinerU process failed: {process_id} - {result.get('error', 'Unknown error')}")
-                    
-                    processes_to_remove.append(process_id)
-                
-                elif result["status"] == "error":
-                    logger.error(f"[ERROR] MinerU process error: {process_id} - {result.get('error', 'Unknown error')}")
-                    processes_to_remove.append(process_id)
-            
-            # Remove completed/failed processes
-            for process_id in processes_to_remove:
-                del self.active_processes[process_id]
-            
-            return completed_uploads
+            return await self._upload_finished_processes(list(self.active_processes))
             
         except Exception as e:
             logger.error(f"[ERROR] Error checking and uploading completed processes: {e}")
             return []
     
+    async def _upload_finished_processes(self, process_ids):
+        """Check the given tracked processes and upload the finished ones concurrently
+        
+        Each upload starts as soon as its own completion check returns, rather
+        than after the slowest check.
+        """
+        snapshot = [(pid, self.active_processes[pid]) for pid in process_ids if pid in self.active_processes]
+        if not snapshot:
+            return []
+        
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        
+        async def check_one(process_id, process_data):
+            return process_id, process_data, await self.check_mineru_process_completion(process_data)
+        
+        async def upload_one(process_id, process_data, result):
+            async with semaphore:
+                return await self._upload_completed_process(process_id, process_data, result)
+        
+        uploads = {}
+        for check in asyncio.as_completed([check_one(*entry) for entry in snapshot]):
+            process_id, process_data, result = await check
+            if result["status"] in ("completed", "error"):
+                uploads[process_id] = asyncio.create_task(upload_one(process_id, process_data, result))
+        if not uploads:
+            return []
+        
+        await asyncio.wait(uploads.values())
+        
+        # Remove completed/failed processes
+        completed_uploads = []
+        for process_id, task in uploads.items():
+            self.active_processes.pop(process_id, None)
+            if task.exception() is not None:
+                logger.error(f"[ERROR] Failed to upload completed process {process_id}: {task.exception()}")
+            elif task.result():
+                completed_uploads.append(task.result())
+        
+        return completed_uploads
+    
+    async def _upload_completed_process(self, process_id, process_data, result):
+        """Upload one finished MinerU process to LightRAG; returns its upload summary or None"""
+        if result["status"] == "error":
+            logger.error(f"[ERROR] MinerU process error: {process_id} - {result.get('error', 'Unknown error')}")
+            return None
+        
+        if not result["success"]:
+            logger.error(f"[ERROR] MinerU process failed: {process_id} - {result.get('error', 'Unknown error')}")
+            return None
+        
+        logger.info(f"[OK] MinerU process completed, uploading to LightRAG: {process_id}")
+        
+        # Validate that we have actual content
+        extracted_text = result.get("extracted_text", "")
+        if not extracted_text or len(extracted_text.strip()) < 50:
+            logger.warning(f"[WARNING] Process {process_id} completed but content is too short ({len(extracted_text)} chars)")
+            return None
+        
+        # Create multimodal content and upload
+        pdf_result = {
+            "extracted_text": extracted_text,
+            "structured_content": result.get("structured_content"),
+            "output_dir": result["output_dir"],
+            "files_created": result["files_created"],
+            "extraction_method": result["extraction_method"]
+        }
+        
+        # Building the enhanced text walks the whole content list; keep it off the event loop
+        multimodal_content = await asyncio.to_thread(self._create_multimodal_content, pdf_result, process_data["doc_id"])
+        upload_result = await self._upload_multimodal_file(multimodal_content, process_data["doc_id"])
+        
+        if not upload_result:
+            logger.error(f"[ERROR] Failed to upload completed process: {process_id}")
+            return None
+        
+        logger.info(f"[OK] Successfully uploaded completed MinerU process: {process_id}")
+        self._mark_ingested(process_data["doc_id"], process_data["datasheet_url"], upload_result)
+        return {
+            "process_id": process_id,
+            "doc_id": process_data["doc_id"],
+            "datasheet_url": process_data["datasheet_url"],
+            "upload_result": upload_result,
+            "extraction_result": pdf_result,
+            "processing_time": time.time() - process_data["started_at"]
+        }
+    
     def get_active_processes_status(self):
         """Get status of all active MinerU processes"""
         try:
@@ -1145,7 +2263,8 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 logger.info("[INFO] Background polling already running")
                 return
             
-            logger.info(f"🚀 Starting automatic background polling (every {self.polling_interval}s)")
+            logger.info("🚀 Starting background uploads of finished MinerU processes")
+            self._upload_workers = [asyncio.create_task(self._upload_worker()) for _ in range(UPLOAD_CONCURRENCY)]
             self.background_polling_task = asyncio.create_task(self._background_polling_loop())
             
         except Exception as e:
@@ -1156,44 +2275,42 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
         try:
             if self.background_polling_task is not None:
                 logger.info("⏹️ Stopping background polling")
-                self.background_polling_task.cancel()
-                try:
-                    await self.background_polling_task
-                except asyncio.CancelledError:
-                    pass
+                tasks = [self.background_polling_task, *self._upload_workers]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
                 self.background_polling_task = None
+                self._upload_workers = []
                 logger.info("[OK] Background polling stopped")
             
         except Exception as e:
             logger.error(f"[ERROR] Error stopping background polling: {e}")
     
     async def _background_polling_loop(self):
-        """Main background polling loop"""
+        """Hand each MinerU process to the uploaders as soon as it exits
+        
+        Waits on a queue fed by the processes' exit callbacks and puts the
+        checked result on the bounded upload queue, so uploads never hold up
+        the handling of the next completion; a full queue applies backpressure.
+        """
         try:
             while self.auto_polling_enabled:
-                if self.active_processes:
-                    logger.info(f"🔍 Background check: {len(self.active_processes)} active processes")
-                    
-                    # Check and upload completed processes
-                    completed = await self.check_and_upload_completed_processes()
-                    
-                    if completed:
-                        logger.info(f"✅ Background polling uploaded {len(completed)} completed processes")
-                        for comp in completed:
-                            logger.info(f"   📄 {comp['doc_id']}: {len(comp['extraction_result']['extracted_text'])} chars")
-                    
-                    # Log remaining active processes
-                    if self.active_processes:
-                        for process_id, process_data in self.active_processes.items():
-                            elapsed = time.time() - process_data["started_at"]
-                            logger.info(f"   ⏳ {process_id}: {elapsed:.1f}s elapsed")
-                else:
-                    # No active processes, sleep longer
-                    await asyncio.sleep(self.polling_interval * 2)
+                process_id = await self._completed_q.get()
+                process_data = self.active_processes.get(process_id)
+                if process_data is None:
+                    continue  # Already uploaded by a manual check
+                
+                try:
+                    result = await self.check_mineru_process_completion(process_data)
+                except Exception as e:
+                    logger.error(f"[ERROR] Error checking MinerU process {process_id}: {e}")
+                    continue
+                if result["status"] not in ("completed", "error"):
                     continue
                 
-                # Wait before next check
-                await asyncio.sleep(self.polling_interval)
+                # Untrack before queueing so a manual check cannot upload it twice
+                self.active_processes.pop(process_id, None)
+                await self._upload_q.put((process_id, process_data, result))
                 
         except asyncio.CancelledError:
             logger.info("[INFO] Background polling cancelled")
@@ -1201,6 +2318,21 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
         except Exception as e:
             logger.error(f"[ERROR] Error in background polling loop: {e}")
     
+    async def _upload_worker(self):
+        """Upload finished MinerU processes taken from the upload queue"""
+        while True:
+            process_id, process_data, result = await self._upload_q.get()
+            try:
+                comp = await self._upload_completed_process(process_id, process_data, result)
+                if comp:
+                    logger.info(f"✅ Background task uploaded {comp['doc_id']}: {len(comp['extraction_result']['extracted_text'])} chars")
+                if self.active_processes:
+                    logger.info(f"   ⏳ {len(self.active_processes)} MinerU processes still running")
+            except Exception as e:
+                logger.error(f"[ERROR] Failed to upload completed process {process_id}: {e}")
+            finally:
+                self._upload_q.task_done()
+    
     async def get_process_status_with_auto_check(self):
         """Get process status and automatically check for completed ones"""
         try:
@@ -1235,8 +2367,70 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             logger.error(f"[ERROR] Error getting process status with auto check: {e}")
             return self.get_active_processes_status()
     
-    async def process_page_with_datasheets_to_lightrag(self, page_record, fast_mode=False):
-        """Process a page with its datasheets and send to LightRAG server"""
+    def _resolve_images_dir(self, output_dir):
+        """output_dir/images if it exists, else None; resolved once per output_dir"""
+        if not output_dir:
+            return None
+        if output_dir not in self._images_dir_cache:
+            images_dir = Path(output_dir) / "images"
+            self._images_dir_cache[output_dir] = str(images_dir) if images_dir.exists() else None
+        return self._images_dir_cache[output_dir]
+    
+    async def _extract_datasheet_fast(self, datasheet, output_dir, datasheet_doc_id, index):
+        """Download and extract one datasheet in fast mode; returns (summary, text) or None
+        
+        The text is not uploaded here so the page's datasheets and overview can
+        be inserted in a single batch. Datasheets already ingested are not
+        downloaded again and come back with a None text.
+        """
+        previous = self._load_ingested(datasheet_doc_id, datasheet["url"])
+        if previous is not None:
+            logger.info(f"[OK] Datasheet {index} already ingested, skipping download and MinerU: {datasheet['url']}")
+            return {
+                "url": datasheet["url"],
+                "doc_id": datasheet_doc_id,
+                "content_type": "already_ingested",
+                "fast_upload": previous
+            }, None
+        
+        ds_result = await self.download_and_process_datasheet(datasheet["url"], output_dir)
+        if not ds_result or not ds_result.get("local_file"):
+            return None
+        
+        text_content = ds_result.get("extracted_text", "")
+        content_list = ds_result.get("content_list", [])
+        
+        if content_list:
+            # We have rich MinerU content - create enhanced text with Supabase Storage URLs
+            images_dir = ds_result.get("images_dir") or self._resolve_images_dir(ds_result.get("output_dir"))
+            
+            # Typed conversion, blocking Supabase Storage uploads and text assembly all run in one worker thread
+            text = await asyncio.to_thread(
+                self._create_enhanced_text_from_content_list, text_content, content_list, datasheet["url"], images_dir
+            )
+            content_type = "rich_mineru"
+            logger.info(f"[OK] Datasheet {index} processed with rich MinerU content ({len(text)} chars)")
+        elif text_content:
+            text = text_content
+            content_type = "simple_text"
+            logger.info(f"[OK] Datasheet {index} processed with simple text extraction ({len(text)} chars)")
+        else:
+            return None
+        
+        return {
+            "url": datasheet["url"],
+            "doc_id": datasheet_doc_id,
+            "extraction": ds_result,
+            "content_type": content_type,
+            "content_length": len(text)
+        }, text
+    
+    async def process_page_with_datasheets_to_lightrag(self, page_record, fast_mode=False, page_updates=None):
+        """Process a page with its datasheets and send to LightRAG server
+        
+        When page_updates is a list, the page's ingested row is appended to it
+        for the caller to write in one upsert instead of being updated here.
+        """
         try:
             page_id = page_record["id"]
             page_url = page_record["url"]
@@ -1249,7 +2443,9 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 return {"error": "Failed to scrape page content"}
             
             # 2. Get related datasheets
-            datasheets_response = self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page_url).limit(5).execute()
+            datasheets_response = await self._supabase_execute(
+                self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page_url).limit(5)
+            )
             datasheets = datasheets_response.data
             
             logger.info(f"📋 Found {len(datasheets)} datasheets for page {page_id}")
@@ -1267,71 +2463,35 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
             
             # New approach: Start async processing for all datasheets, then check periodically
             started_processes = []
+            datasheet_texts = []  # (doc_id, text) extracted in fast mode, inserted together with the overview
             
-            for i, datasheet in enumerate(datasheets[:3], 1):  # Limit to first 3 for testing
-                datasheet_doc_id = f"page_{page_id}_datasheet_{i}"
+            if fast_mode:
+                # Fast mode: download and process the datasheets concurrently for immediate results
+                semaphore = asyncio.Semaphore(self.max_concurrent_datasheets)
                 
-                if fast_mode:
-                    # Fast mode: Use synchronous processing for immediate results
-                    ds_result = await self.download_and_process_datasheet(datasheet["url"], output_dir)
-                    if ds_result and ds_result.get("local_file"):
-                        # Process with existing fast mode logic
-                        text_content = ds_result.get("extracted_text", "")
-                        content_list = ds_result.get("content_list", [])
-                        
-                        if content_list:
-                            # We have rich MinerU content - create enhanced text with Supabase Storage URLs
-                            images_dir = None
-                            if ds_result.get("images_dir"):
-                                images_dir = ds_result["images_dir"]
-                            elif ds_result.get("output_dir"):
-                                potential_images_dir = Path(ds_result["output_dir"]) / "images"
-                                if potential_images_dir.exists():
-                                    images_dir = str(potential_images_dir)
-                            
-                            enhanced_text = self._create_enhanced_text_from_content_list(
-                                text_content, 
-                                content_list, 
-                                datasheet["url"], 
-                                images_base_dir=images_dir,
-                                upload_to_storage=True
-                            )
-                            simple_upload = self.insert_text_to_lightrag(enhanced_text, datasheet_doc_id)
-                            if simple_upload:
-                                logger.info(f"[OK] Datasheet {i} processed with rich MinerU content ({len(enhanced_text)} chars)")
-                                processed_datasheets.append({
-                                    "url": datasheet["url"],
-                                    "extraction": ds_result,
-                                    "content_type": "rich_mineru",
-                                    "content_length": len(enhanced_text),
-                                    "fast_upload": simple_upload
-                                })
-                        elif text_content:
-                            simple_upload = self.insert_text_to_lightrag(text_content, datasheet_doc_id)
-                            if simple_upload:
-                                logger.info(f"[OK] Datasheet {i} processed with simple text extraction ({len(text_content)} chars)")
-                                processed_datasheets.append({
-                                    "url": datasheet["url"],
-                                    "extraction": ds_result,
-                                    "content_type": "simple_text",
-                                    "content_length": len(text_content),
-                                    "fast_upload": simple_upload
-                                })
-                else:
-                    # Async mode: Start MinerU processing without waiting
-                    async_result = await self.download_and_start_async_datasheet_processing(
-                        datasheet["url"], output_dir, datasheet_doc_id
-                    )
-                    
-                    if async_result:
-                        started_processes.append({
-                            "index": i,
-                            "process_info": async_result,
-                            "datasheet": datasheet
-                        })
-                        logger.info(f"[OK] Started async processing for datasheet {i}: {async_result['process_id']}")
-                    else:
-                        logger.warning(f"[WARNING] Failed to start async processing for datasheet {i}")
+                async def process_one(i, datasheet):
+                    async with semaphore:
+                        return await self._extract_datasheet_fast(
+                            datasheet, output_dir, f"page_{page_id}_datasheet_{i}", i
+                        )
+                
+                results = await asyncio.gather(
+                    *(process_one(i, ds) for i, ds in enumerate(datasheets[:3], 1)),  # Limit to first 3 for testing
+                    return_exceptions=True
+                )
+                for i, result in enumerate(results, 1):
+                    if isinstance(result, Exception):
+                        logger.error(f"[ERROR] Datasheet {i} failed: {result}")
+                    elif result:
+                        summary, text = result
+                        processed_datasheets.append(summary)
+                        if text is not None:
+                            datasheet_texts.append((summary["doc_id"], text))
+            else:
+                # Async mode: pipeline downloads into MinerU starts without waiting for extraction
+                started_processes = await self._start_datasheets_pipelined(
+                    datasheets[:3], output_dir, page_id  # Limit to first 3 for testing
+                )
             
             # If we started async processes, start background polling and return immediately
             if started_processes and not fast_mode:
@@ -1345,7 +2505,6 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                     "async_processes": len(started_processes),
                     "process_ids": [p["process_info"]["process_id"] for p in started_processes],
                     "background_polling_active": True,
-                    "polling_interval_seconds": self.polling_interval,
                     "message": f"Started async MinerU processing for {len(started_processes)} datasheets. Background polling will automatically upload when complete."
                 }
             
@@ -1354,35 +2513,39 @@ Note: Full multimodal extraction (images, tables) was not available due to proce
                 logger.warning("[WARNING] No datasheets were successfully processed")
             
             # 4. Create overview content for LightRAG (this provides context linking web content to PDFs)
-            overview_content = f"""
+            overview_parts = [f"""
 PRODUCT OVERVIEW: {page_content['title']}
 BUSINESS AREA: {page_record.get('business_area', 'unknown')}
 PAGE TYPE: {page_record.get('page_type', 'unknown')}
 SOURCE URL: {page_url}
 
 WEB CONTENT SUMMARY:
-{page_content['content'][:2000]}
+{_summarize_for_overview(page_content['content'])}
 
 TECHNICAL DOCUMENTATION OVERVIEW:
 This product has {len(processed_datasheets)} technical datasheets that have been processed with RAGAnything multimodal extraction:
-"""
+"""]
             
             # Add datasheet overview (not full content, as that's already ingested separately)
             for i, ds in enumerate(processed_datasheets, 1):
                 filename = ds["url"].split('/')[-1]
-                overview_content += f"\n• DATASHEET {i}: {filename}"
-                if "multimodal_ingestion" in ds:
-                    overview_content += " ([OK] Multimodal: tables, images, formulas extracted)"
-                else:
-                    overview_content += " (📄 Text only)"
+                marker = " ([OK] Multimodal: tables, images, formulas extracted)" if "multimodal_ingestion" in ds else " (📄 Text only)"
+                overview_parts.append(f"\n• DATASHEET {i}: {filename}{marker}")
             
-            overview_content += f"\n\nCOMPLETE SUMMARY: Product '{page_content['title']}' with {len(processed_datasheets)} technical documents fully processed with RAGAnything multimodal capabilities for comprehensive retrieval."
+            overview_parts.append(f"\n\nCOMPLETE SUMMARY: Product '{page_content['title']}' with {len(processed_datasheets)} technical documents fully processed with RAGAnything multimodal capabilities for comprehensive retrieval.")
+            overview_content = "".join(overview_parts)
             
-            # 5. Send overview to LightRAG server (the detailed PDF content is already uploaded)
+            # 5. Send the datasheet texts and the overview to LightRAG server in one batch
             doc_id = f"page_{page_id}_overview"
-            insertion_result = self.insert_text_to_lightrag(overview_content, doc_id)
+            insertion_result = await self.insert_texts_to_lightrag(datasheet_texts + [(doc_id, overview_content)])
             
             if insertion_result:
+                for ds in processed_datasheets:
+                    if ds.get("content_type") == "already_ingested":
+                        continue
+                    ds["fast_upload"] = insertion_result
+                    self._mark_ingested(ds["doc_id"], ds["url"], insertion_result)
+                
                 # Mark page as ingested in Supabase with LightRAG track ID
                 update_data = {"ingested": True}
                 
@@ -1397,9 +2560,14 @@ This product has {len(processed_datasheets)} technical datasheets that have been
                 else:
                     logger.warning(f"[WARNING] No track_id found in response: {insertion_result}")
                 
-                # Update Supabase
-                update_result = self.supabase.table("new_pages_index").update(update_data).eq("id", page_id).execute()
-                logger.info(f"[DEBUG] Supabase update result: {update_result.data[0] if update_result.data else 'No data'}")
+                # Update Supabase, or leave it to the caller's batched upsert
+                if page_updates is not None:
+                    page_updates.append({"id": page_id, **update_data})
+                else:
+                    update_result = await self._supabase_execute(
+                        self.supabase.table("new_pages_index").update(update_data).eq("id", page_id)
+                    )
+                    logger.info(f"[DEBUG] Supabase update result: {update_result.data[0] if update_result.data else 'No data'}")
                 
                 logger.info(f"[OK] Page {page_id} successfully ingested to LightRAG server")
                 
@@ -1427,21 +2595,28 @@ This product has {len(processed_datasheets)} technical datasheets that have been
             logger.info(f"🎯 Processing specific page {page_id} to LightRAG server")
             
             # Test server connection first
-            if not self.test_lightrag_server_connection():
+            if not await self._ensure_server():
                 return {"error": "Cannot connect to LightRAG server"}
             
             # Get specific page
-            page_response = self.supabase.table("new_pages_index").select("*").eq("id", page_id).execute()
-            
-            if not page_response.data:
-                return {"error": f"Page {page_id} not found"}
-            
-            page = page_response.data[0]
+            page = self._ttl_get(self._row_cache, ("page", page_id))
+            if page is None:
+                page_response = await self._supabase_execute(self.supabase.table("new_pages_index").select("*").eq("id", page_id))
+                if not page_response.data:
+                    return {"error": f"Page {page_id} not found"}
+                page = page_response.data[0]
+                self._ttl_put(self._row_cache, ("page", page_id), page, PAGE_ROW_TTL, PAGE_ROW_CACHE_SIZE)
             
             # Check if page has datasheets
-            datasheets_response = self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page["url"]).limit(5).execute()
-            
-            if not datasheets_response.data:
+            datasheets = self._ttl_get(self._row_cache, ("datasheets", page["url"]))
+            if datasheets is None:
+                datasheets_response = await self._supabase_execute(
+                    self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page["url"]).limit(5)
+                )
+                datasheets = datasheets_response.data or []
+                self._ttl_put(self._row_cache, ("datasheets", page["url"]), datasheets, PAGE_ROW_TTL, PAGE_ROW_CACHE_SIZE)
+            
+            if not datasheets:
                 logger.warning(f"[WARNING] Page {page_id} has no datasheets, processing web content only")
                 # Process web content only
                 return await self.process_page_web_content_to_lightrag(page)
@@ -1466,8 +2641,13 @@ This product has {len(processed_datasheets)} technical datasheets that have been
         try:
             logger.info(f"🌐 Processing web content only for page {page['id']}")
             
-            # Scrape web content
-            web_content = self.scrape_web_content(page["url"])
+            # Scrape web content; an ingested page revalidates with the validators stored on its row
+            validators = (page.get("etag"), page.get("last_modified")) if page.get("ingested") else None
+            page_content = await self.scrape_page_content(page["url"], validators=validators)
+            if page_content and page_content.get("not_modified") and page.get("ingested"):
+                logger.info(f"[OK] Page {page['id']} unchanged since last ingestion, skipping upload")
+                return {"status": "skipped_304", "page_id": page["id"], "page_url": page["url"]}
+            web_content = page_content["content"] if page_content else None
             if not web_content:
                 return {"status": "error", "page_id": page["id"], "error": "Failed to scrape web content"}
             
@@ -1486,7 +2666,7 @@ CONTENT:
 📚 REFERENCE: For complete information, visit {page['url']}
 """
             
-            result = self.insert_text_to_lightrag(enhanced_content, doc_id)
+            result = await self.insert_text_to_lightrag(enhanced_content, doc_id)
             
             if result:
                 # Mark page as ingested with LightRAG track ID
@@ -1497,7 +2677,12 @@ CONTENT:
                     update_data["lightrag_track_id"] = result["track_id"]
                     logger.info(f"[OK] Storing LightRAG track ID: {result['track_id']}")
                 
-                self.supabase.table("new_pages_index").update(update_data).eq("id", page["id"]).execute()
+                # Keep the page's validators for the next run when the table has columns for them
+                for column in ("etag", "last_modified"):
+                    if column in page:
+                        update_data[column] = page_content.get(column) or page[column]
+                
+                await self._supabase_execute(self.supabase.table("new_pages_index").update(update_data).eq("id", page["id"]))
                 
                 return {
                     "status": "success",
@@ -1514,34 +2699,83 @@ CONTENT:
             logger.error(f"[ERROR] Error processing web content for page {page['id']}: {e}")
             return {"status": "error", "page_id": page["id"], "error": str(e)}
 
-    async def bulk_ingest_to_lightrag(self, max_pages=5, fast_mode=False):
-        """Bulk ingest pages with datasheets to LightRAG server"""
+    async def _flush_page_updates(self, page_updates):
+        """Mark accumulated pages as ingested with one update per distinct payload
+        
+        Rows whose fields (everything but id) are identical share a single
+        update(...).in_("id", ids) call. An update never inserts, so partial
+        rows cannot trip NOT NULL columns or the table's INSERT policy.
+        """
+        groups = {}
+        for row in page_updates:
+            payload = tuple(sorted((k, v) for k, v in row.items() if k != "id"))
+            groups.setdefault(payload, []).append(row["id"])
+        
+        results = await asyncio.gather(*(
+            self._supabase_execute(self.supabase.table("new_pages_index").update(dict(payload)).in_("id", ids))
+            for payload, ids in groups.items()
+        ), return_exceptions=True)
+        
+        failed = 0
+        for ids, result in zip(groups.values(), results):
+            if isinstance(result, Exception):
+                failed += len(ids)
+                logger.error(f"[ERROR] Could not mark pages {ids} as ingested: {result}")
+        logger.info(f"[OK] Marked {len(page_updates) - failed} pages as ingested in {len(groups)} Supabase request(s)")
+    
+    async def bulk_ingest_to_lightrag(self, max_pages=5, fast_mode=False, concurrency=PAGE_CONCURRENCY):
+        """Bulk ingest pages with datasheets to LightRAG server, `concurrency` pages at a time"""
         try:
-            logger.info(f"🚀 Starting bulk ingestion to LightRAG server (max {max_pages} pages)")
+            logger.info(f"🚀 Starting bulk ingestion to LightRAG server (max {max_pages} pages, {concurrency} at a time)")
             
             # Test server connection first
-            if not self.test_lightrag_server_connection():
+            if not await self._ensure_server():
                 return {"error": "Cannot connect to LightRAG server"}
             
             # Get unprocessed pages with datasheets
-            pages_response = self.supabase.table("new_pages_index").select("*").eq("ingested", False).limit(20).execute()
-            
-            pages_with_datasheets = []
-            for page in pages_response.data:
-                datasheets_response = self.supabase.table("new_datasheets_index").select("*").eq("parent_url", page["url"]).limit(1).execute()
-                if datasheets_response.data:
-                    pages_with_datasheets.append(page)
+            pages_response = await self._supabase_execute(
+                self.supabase.table("new_pages_index").select("*").eq("ingested", False).limit(20)
+            )
             
-            # Process pages
+            # One query for all candidate pages instead of one existence check per page
+            page_urls = [page["url"] for page in pages_response.data]
+            urls_with_datasheets = set()
+            if page_urls:
+                datasheets_response = await self._supabase_execute(
+                    self.supabase.table("new_datasheets_index").select("parent_url").in_("parent_url", page_urls)
+                )
+                urls_with_datasheets = {row["parent_url"] for row in datasheets_response.data}
+            pages_with_datasheets = [page for page in pages_response.data if page["url"] in urls_with_datasheets]
+            
+            # Process pages concurrently; requests to the LightRAG server go through the
+            # adaptive limiter, so no fixed delay between pages is needed
             pages_to_process = pages_with_datasheets[:max_pages]
-            results = []
+            semaphore = asyncio.Semaphore(concurrency)
+            page_updates = []  # Ingested rows, written every PAGE_UPDATE_FLUSH_SIZE pages
+            
+            async def flush():
+                # Swap the list out before awaiting so concurrent pages never flush a row twice
+                rows = page_updates[:]
+                page_updates.clear()
+                if rows:
+                    await self._flush_page_updates(rows)
+            
+            async def process_one(page):
+                async with semaphore:
+                    result = await self.process_page_with_datasheets_to_lightrag(page, fast_mode=fast_mode, page_updates=page_updates)
+                if len(page_updates) >= PAGE_UPDATE_FLUSH_SIZE:
+                    await flush()
+                return result
             
-            for page in pages_to_process:
-                result = await self.process_page_with_datasheets_to_lightrag(page, fast_mode=fast_mode)
-                results.append(result)
-                
-                # Small delay to avoid overwhelming the server
-                await asyncio.sleep(1)
+            try:
+                results = await asyncio.gather(*(process_one(page) for page in pages_to_process), return_exceptions=True)
+            finally:
+                # Also runs on errors/cancellation, so uploaded pages are not re-ingested next run
+                await flush()
+            results = [
+                {"error": str(r), "page_id": page["id"]} if isinstance(r, Exception) else r
+                for page, r in zip(pages_to_process, results)
+            ]
             
             successful = len([r for r in results if r.get("status") == "success"])
             
@@ -1571,6 +2805,7 @@ async def main():
     ingest_cmd.add_argument('--max-pages', type=int, default=5, help='Maximum pages to process')
     ingest_cmd.add_argument('--page-id', type=int, help='Process a specific page by ID')
     ingest_cmd.add_argument('--fast-mode', action='store_true', help='Use faster text extraction (skip full multimodal processing)')
+    ingest_cmd.add_argument('--concurrency', type=int, default=PAGE_CONCURRENCY, help='Pages processed at once')
     
     query_cmd = subparsers.add_parser('query', help='Query the LightRAG server')
     query_cmd.add_argument('question', help='Question to ask')
@@ -1584,6 +2819,7 @@ async def main():
     multimodal_cmd = subparsers.add_parser('multimodal', help='Process PDF with RAGAnything multimodal extraction and upload to LightRAG')
     multimodal_cmd.add_argument('pdf_path', help='Path to PDF file')
     multimodal_cmd.add_argument('--doc-id', default='test_multimodal', help='Document ID for LightRAG')
+    multimodal_cmd.add_argument('--save-json', action='store_true', help='Also keep the structured multimodal JSON in WORKING_DIR')
     
     # Async processing commands
     async_cmd = subparsers.add_parser('async', help='Async MinerU processing commands')
@@ -1594,8 +2830,7 @@ async def main():
     
     check_cmd = async_subparsers.add_parser('check', help='Check and upload completed processes')
     
-    polling_cmd = async_subparsers.add_parser('start-polling', help='Start background polling')
-    polling_cmd.add_argument('--interval', type=int, default=30, help='Polling interval in seconds')
+    async_subparsers.add_parser('start-polling', help='Start background uploads of finished processes')
     
     stop_polling_cmd = async_subparsers.add_parser('stop-polling', help='Stop background polling')
     
@@ -1605,14 +2840,15 @@ async def main():
         parser.print_help()
         return 0
     
+    client = None
     try:
         # Get server URL from command line argument, environment variable, or default
         server_url = (args.server if hasattr(args, 'server') and args.server is not None 
                      else os.getenv('LIGHTRAG_SERVER_URL', 'http://localhost:8020'))
-        client = LightRAGServerClient(server_url)
+        client = LightRAGServerClient(server_url, persist_debug_json=getattr(args, 'save_json', False))
         
         if args.command == 'test':
-            success = client.test_lightrag_server_connection()
+            success = await client.test_lightrag_server_connection()
             if success:
                 print("[OK] LightRAG server connection successful!")
             else:
@@ -1625,11 +2861,13 @@ async def main():
                 result = await client.process_specific_page_to_lightrag(args.page_id, fast_mode=getattr(args, 'fast_mode', False))
             else:
                 # Bulk process pages
-                result = await client.bulk_ingest_to_lightrag(args.max_pages, fast_mode=getattr(args, 'fast_mode', False))
+                result = await client.bulk_ingest_to_lightrag(
+                    args.max_pages, fast_mode=getattr(args, 'fast_mode', False), concurrency=args.concurrency
+                )
             print(json.dumps(result, indent=2))
             
         elif args.command == 'query':
-            answer = client.query_lightrag_server(args.question, args.mode)
+            answer = await client.query_lightrag_server(args.question, args.mode)
             print(f"Question: {args.question}")
             print(f"Mode: {args.mode}")
             print(f"Answer: {answer}")
@@ -1646,12 +2884,13 @@ async def main():
                 
         elif args.command == 'multimodal':
             print(f"🚀 Processing PDF with RAGAnything multimodal extraction: {args.pdf_path}")
-            result = client.insert_multimodal_content_to_lightrag(args.pdf_path, args.doc_id)
+            result = await client.insert_multimodal_content_to_lightrag(args.pdf_path, args.doc_id)
             if result:
                 print(f"[OK] Multimodal content uploaded to LightRAG server successfully!")
                 print(f"📄 Document ID: {args.doc_id}")
                 print(f"🔄 Content type: {result.get('content_type')}")
-                print(f"📁 Local backup: {result.get('local_file')}")
+                if result.get('local_file'):
+                    print(f"📁 Local backup: {result['local_file']}")
                 if result.get('upload_result'):
                     print(f"🌐 Server response: {result['upload_result']}")
             else:
@@ -1694,15 +2933,15 @@ async def main():
                     print("   No completed processes found")
                     
             elif args.async_command == 'start-polling':
-                client.polling_interval = getattr(args, 'interval', 30)
                 await client.start_background_polling()
-                print(f"🚀 Background polling started (interval: {client.polling_interval}s)")
+                print("🚀 Background polling started (uploads each process as soon as it finishes)")
                 print("   Polling will continue until stopped or program exits")
                 
                 # Keep running until user interrupts
                 try:
                     while client.background_polling_task and not client.background_polling_task.done():
-                        await asyncio.sleep(5)
+                        # Wake for the periodic status line, or as soon as the polling task ends
+                        await asyncio.wait({client.background_polling_task}, timeout=5)
                         status = client.get_active_processes_status()
                         if status['active_processes'] > 0:
                             print(f"   📊 Status: {status['active_processes']} active processes")
@@ -1721,6 +2960,9 @@ async def main():
         import traceback
         traceback.print_exc()
         return 1
+    finally:
+        if client is not None:
+            await client.aclose()
 
 if __name__ == "__main__":
     exit(asyncio.run(main()))
\ No newline at end of file
@@ -6,21 +6,40 @@ Processes documents and uploads to remote LightRAG server
 
 import os
 import asyncio
+import time
 import aiohttp
 import tempfile
 import json
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
+from async_utils import AdaptiveLimiter, backoff_delay
+
 # Load environment
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pooled connections to the LightRAG server, kept alive between requests
+MAX_CONCURRENCY = int(os.getenv("LIGHTRAG_MAX_CONCURRENCY", "8"))  # in-flight uploads
+CONNECTOR_LIMIT = int(os.getenv("LIGHTRAG_CONNECTOR_LIMIT", "32"))
+CONNECTOR_LIMIT_PER_HOST = 16
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 60  # seconds
+
+# Upload retries and AIMD concurrency control
+UPLOAD_RETRIES = 5
+UPLOAD_BACKOFF = 0.5  # seconds, doubled per attempt
+UPLOAD_BACKOFF_MAX = 30  # seconds
+RETRY_STATUSES = {429, 502, 503, 504}
+LATENCY_TARGET = float(os.getenv("LIGHTRAG_LATENCY_TARGET", "10"))  # seconds, mean upload latency
+AIMD_WINDOW = 10  # seconds between concurrency adjustments
+
+
 class LightRAGServerClient:
     def __init__(self):
         self.server_url = os.getenv("LIGHTRAG_SERVER_URL", "https://lightrag-latest-hyhs.onrender.com/")
@@ -32,33 +51,89 @@ class LightRAGServerClient:
         # Remove trailing slash
         self.server_url = self.server_url.rstrip('/')
         
+        self._session = None
+        # Grows by half a permit per healthy window, halves on throttling or slow uploads
+        self._limiter = AdaptiveLimiter(
+            initial=max(1, MAX_CONCURRENCY // 2),
+            maximum=MAX_CONCURRENCY,
+            window=AIMD_WINDOW,
+            step=0.5,
+            latency_target=LATENCY_TARGET
+        )
+        
         logger.info(f"LightRAG Server: {self.server_url}")
     
+    async def start(self):
+        """Open the shared session; requests reuse its pooled keep-alive connections"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=CONNECTOR_LIMIT,
+                    limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT
+                ),
+                timeout=aiohttp.ClientTimeout(total=120),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.close()
+    
+    async def _post_insert(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """POST a payload to /insert, retrying throttled and failed connections; returns (status, result)"""
+        session = await self.start()
+        url = f"{self.server_url}/insert"
+        
+        for attempt in range(UPLOAD_RETRIES):
+            retry_after = None
+            try:
+                async with self._limiter:
+                    started = time.monotonic()
+                    async with session.post(url, json=data, timeout=aiohttp.ClientTimeout(total=120)) as response:
+                        throttled = (response.status in RETRY_STATUSES
+                                     or response.headers.get("X-RateLimit-Remaining") == "0")
+                        self._limiter.record(throttled, latency=time.monotonic() - started)
+                        
+                        if response.status == 200:
+                            return response.status, await response.json()
+                        
+                        error_text = await response.text()
+                        if response.status not in RETRY_STATUSES or attempt == UPLOAD_RETRIES - 1:
+                            logger.error(f"Upload failed (status {response.status}): {error_text}")
+                            return response.status, {"error": f"HTTP {response.status}: {error_text}"}
+                        retry_after = response.headers.get("Retry-After")
+                        logger.warning(f"Upload got HTTP {response.status}, retrying ({attempt + 1}/{UPLOAD_RETRIES})")
+            except aiohttp.ClientConnectorError as e:
+                self._limiter.record(True)
+                if attempt == UPLOAD_RETRIES - 1:
+                    raise
+                logger.warning(f"Cannot connect to LightRAG server ({e}), retrying ({attempt + 1}/{UPLOAD_RETRIES})")
+            
+            # Back off outside the limiter so waiting retries don't hold a slot
+            await asyncio.sleep(backoff_delay(attempt, retry_after, base=UPLOAD_BACKOFF, cap=UPLOAD_BACKOFF_MAX))
+    
     async def upload_document(self, content: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """Upload document content to LightRAG server"""
         try:
-            async with aiohttp.ClientSession() as session:
-                data = {
-                    "content": content,
-                    "metadata": metadata or {}
-                }
-                
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                url = f"{self.server_url}/insert"
-                
-                async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Document uploaded successfully: {result}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Upload failed (status {response.status}): {error_text}")
-                        return {"error": f"HTTP {response.status}: {error_text}"}
+            _, result = await self._post_insert({
+                "content": content,
+                "metadata": metadata or {}
+            })
+            if not result.get("error"):
+                logger.info(f"Document uploaded successfully: {result}")
+            return result
                         
         except Exception as e:
             logger.error(f"Error uploading to LightRAG server: {e}")
@@ -67,28 +142,23 @@ class LightRAGServerClient:
     async def query_server(self, query: str, mode: str = "hybrid") -> Dict[str, Any]:
         """Query the LightRAG server"""
         try:
-            async with aiohttp.ClientSession() as session:
-                data = {
-                    "query": query,
-                    "mode": mode
-                }
-                
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                url = f"{self.server_url}/query"
-                
-                async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=60)) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Query successful: {query[:50]}...")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Query failed (status {response.status}): {error_text}")
-                        return {"error": f"HTTP {response.status}: {error_text}"}
+            session = await self.start()
+            data = {
+                "query": query,
+                "mode": mode
+            }
+            
+            url = f"{self.server_url}/query"
+            
+            async with session.post(url, json=data, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Query successful: {query[:50]}...")
+                    return result
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Query failed (status {response.status}): {error_text}")
+                    return {"error": f"HTTP {response.status}: {error_text}"}
                         
         except Exception as e:
             logger.error(f"Error querying LightRAG server: {e}")
@@ -97,22 +167,18 @@ class LightRAGServerClient:
     async def check_server_status(self) -> Dict[str, Any]:
         """Check server status"""
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                url = f"{self.server_url}/status"
-                
-                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info("Server status check successful")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Status check failed (status {response.status}): {error_text}")
-                        return {"error": f"HTTP {response.status}: {error_text}"}
+            session = await self.start()
+            url = f"{self.server_url}/status"
+            
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info("Server status check successful")
+                    return result
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Status check failed (status {response.status}): {error_text}")
+                    return {"error": f"HTTP {response.status}: {error_text}"}
                         
         except Exception as e:
             logger.error(f"Error checking server status: {e}")
@@ -227,33 +293,32 @@ async def test_lightrag_server_integration():
     print("=== Testing LightRAG Server Integration ===")
     
     try:
-        # Initialize client
-        client = LightRAGServerClient()
-        
-        print("1. Checking server status...")
-        status = await client.check_server_status()
-        print(f"   Server status: {status}")
-        
-        if status.get("error"):
-            print("   Server not accessible - check URL and API key")
-            return
-        
-        print("\n2. Testing simple upload...")
-        test_content = "This is a test document about Althen sensors for testing the LightRAG server integration."
-        test_metadata = {
-            "test": True,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        upload_result = await client.upload_document(test_content, test_metadata)
-        print(f"   Upload result: {upload_result}")
-        
-        if not upload_result.get("error"):
-            print("\n3. Testing query...")
-            query_result = await client.query_server("What is this test about?")
-            print(f"   Query result: {query_result}")
-        
-        print("\n4. Test completed!")
+        # Initialize client; one session serves every request below
+        async with LightRAGServerClient() as client:
+            print("1. Checking server status...")
+            status = await client.check_server_status()
+            print(f"   Server status: {status}")
+            
+            if status.get("error"):
+                print("   Server not accessible - check URL and API key")
+                return
+            
+            print("\n2. Testing simple upload...")
+            test_content = "This is a test document about Althen sensors for testing the LightRAG server integration."
+            test_metadata = {
+                "test": True,
+                "timestamp": datetime.now().isoformat()
+            }
+            
+            upload_result = await client.upload_document(test_content, test_metadata)
+            print(f"   Upload result: {upload_result}")
+            
+            if not upload_result.get("error"):
+                print("\n3. Testing query...")
+                query_result = await client.query_server("What is this test about?")
+                print(f"   Query result: {query_result}")
+            
+            print("\n4. Test completed!")
         
     except Exception as e:
         print(f"Error during test: {e}")
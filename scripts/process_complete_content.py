@@ -26,6 +26,16 @@ from scripts.raganything_api_service import (
     upload_processed_document_to_supabase
 )
 
+# Datasheets parsed at once for a page; each runs MinerU on the shared rag_instance, so keep it small
+DATASHEET_CONCURRENCY = int(os.getenv("DATASHEET_CONCURRENCY", "2"))
+
+def download_pdf(url: str) -> str:
+    """Download a PDF to a temporary file and return its path"""
+    response = requests.get(url)
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
+        tmp_file.write(response.content)
+        return tmp_file.name
+
 def scrape_web_content(url: str, max_length: int = 10000) -> str:
     """Scrape and clean web content from URL"""
     try:
@@ -41,9 +51,7 @@ def scrape_web_content(url: str, max_length: int = 10000) -> str:
         text = soup.get_text()
         
         # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        web_content = ' '.join(chunk for chunk in chunks if chunk)
+        web_content = ' '.join(text.split())
         
         # Limit content length
         if len(web_content) > max_length:
@@ -219,16 +227,14 @@ async def process_page_complete(page_id: int):
         
         # Process datasheets if available
         if datasheets:
-            pdf_sections = []
+            semaphore = asyncio.Semaphore(DATASHEET_CONCURRENCY)
             
-            for datasheet in datasheets:
+            async def process_datasheet(datasheet):
+                uploaded = []
                 logger.info(f"Processing datasheet: {datasheet['url']}")
                 
-                # Download PDF
-                response = requests.get(datasheet['url'])
-                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
-                    tmp_file.write(response.content)
-                    pdf_path = tmp_file.name
+                # Download PDF off the event loop so datasheets overlap
+                pdf_path = await asyncio.to_thread(download_pdf, datasheet['url'])
                 
                 try:
                     # Process with RAGAnything
@@ -278,7 +284,7 @@ async def process_page_complete(page_id: int):
                             
                             if image_url:
                                 image_url_map[image_file] = image_url
-                                all_images_uploaded.append(image_url)
+                                uploaded.append(image_url)
                                 
                                 if (i + 1) % 10 == 0:
                                     logger.info(f"Uploaded {i+1}/{len(mineru_result['images'])} images")
@@ -303,14 +309,27 @@ async def process_page_complete(page_id: int):
 
 ---
 """
-                    pdf_sections.append(pdf_section)
                     logger.info(f"Added PDF section with {len(image_url_map)} images")
+                    return pdf_section, uploaded
                     
                 finally:
                     # Clean up
                     if os.path.exists(pdf_path):
                         os.unlink(pdf_path)
             
+            async def _proc(datasheet):
+                async with semaphore:
+                    return await process_datasheet(datasheet)
+            
+            # Let every datasheet finish before surfacing a failure, so none are left running orphaned
+            results = await asyncio.gather(*[_proc(d) for d in datasheets], return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            pdf_sections = [section for section, _ in results]
+            for _, uploaded in results:
+                all_images_uploaded.extend(uploaded)
+            
             # Add all PDF sections
             if pdf_sections:
                 all_content_sections.extend(pdf_sections)
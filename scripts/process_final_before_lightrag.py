@@ -165,7 +165,6 @@ def generate_natural_description(img_info: dict, surrounding_text: str = "") ->
     # Extract meaningful phrases from table content for tables
     if img_type == "table" and table_body:
         # Extract key information from table HTML
-        import re
         # Remove HTML tags
         clean_table = re.sub('<[^<]+?>', ' ', table_body)
         # Look for meaningful patterns
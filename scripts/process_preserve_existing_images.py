@@ -41,9 +41,7 @@ def scrape_web_content(url: str, max_length: int = 10000) -> str:
         text = soup.get_text()
         
         # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        web_content = ' '.join(chunk for chunk in chunks if chunk)
+        web_content = ' '.join(text.split())
         
         # Limit content length
         if len(web_content) > max_length:
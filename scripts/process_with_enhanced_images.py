@@ -182,9 +182,7 @@ async def process_page_with_enhanced_images(page_id: int):
                 text = soup.get_text()
                 
                 # Clean up text
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                web_content = ' '.join(chunk for chunk in chunks if chunk)
+                web_content = ' '.join(text.split())
                 
                 # Limit content length
                 if len(web_content) > 5000:
@@ -26,7 +26,7 @@ except ImportError:
     print("[WARNING] python-dotenv not available, using system environment variables")
 
 # Import our LightRAG client
-from lightrag_server_client import LightRAGServerClient
+from lightrag_server_client import LightRAGServerClient, PAGE_CONCURRENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,7 +56,7 @@ async def lifespan(app: FastAPI):
         logger.info(f"[OK] LightRAG client initialized (Server: {LIGHTRAG_SERVER_URL})")
         
         # Test connection
-        if rag_client.test_lightrag_server_connection():
+        if await rag_client.test_lightrag_server_connection():
             logger.info("[OK] LightRAG server connection successful")
         else:
             logger.warning("[WARNING] LightRAG server connection failed - will retry on requests")
@@ -69,6 +69,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down RAG API Service...")
+    if rag_client:
+        await rag_client.aclose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -131,7 +133,7 @@ async def health_check():
     
     if rag_client:
         try:
-            lightrag_connected = rag_client.test_lightrag_server_connection()
+            lightrag_connected = await rag_client.test_lightrag_server_connection()
         except Exception:
             pass
     
@@ -285,32 +287,32 @@ async def batch_process_pages(
             detail="Batch processing limited to 10 pages at a time"
         )
     
-    results = []
     start_time = datetime.now()
+    semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
     
-    for page_id in page_ids:
-        try:
-            logger.info(f"[BATCH] Batch processing page {page_id}")
-            result = await rag_client.process_specific_page_to_lightrag(
-                page_id,
-                fast_mode=fast_mode
-            )
-            results.append({
-                "page_id": page_id,
-                "success": "error" not in result,
-                "result": result
-            })
-            
-            # Small delay between pages
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            logger.error(f"[ERROR] Error processing page {page_id} in batch: {e}")
-            results.append({
-                "page_id": page_id,
-                "success": False,
-                "error": str(e)
-            })
+    async def process_one(page_id):
+        async with semaphore:
+            try:
+                logger.info(f"[BATCH] Batch processing page {page_id}")
+                result = await rag_client.process_specific_page_to_lightrag(
+                    page_id,
+                    fast_mode=fast_mode
+                )
+                return {
+                    "page_id": page_id,
+                    "success": "error" not in result,
+                    "result": result
+                }
+            except Exception as e:
+                logger.error(f"[ERROR] Error processing page {page_id} in batch: {e}")
+                return {
+                    "page_id": page_id,
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    # No fixed delay between pages: the client's adaptive limiter paces LightRAG requests
+    results = await asyncio.gather(*(process_one(page_id) for page_id in page_ids))
     
     processing_time = (datetime.now() - start_time).total_seconds()
     successful = len([r for r in results if r["success"]])
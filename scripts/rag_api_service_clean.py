@@ -26,7 +26,7 @@ except ImportError:
     print("[WARNING] python-dotenv not available, using system environment variables")
 
 # Import our LightRAG client
-from lightrag_server_client import LightRAGServerClient
+from lightrag_server_client import LightRAGServerClient, PAGE_CONCURRENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,7 +56,7 @@ async def lifespan(app: FastAPI):
         logger.info(f"[OK] LightRAG client initialized (Server: {LIGHTRAG_SERVER_URL})")
         
         # Test connection
-        if rag_client.test_lightrag_server_connection():
+        if await rag_client.test_lightrag_server_connection():
             logger.info("[OK] LightRAG server connection successful")
         else:
             logger.warning("[WARNING] LightRAG server connection failed - will retry on requests")
@@ -69,6 +69,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("[SHUTDOWN] Shutting down RAG API Service...")
+    if rag_client:
+        await rag_client.aclose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -147,7 +149,7 @@ async def health_check():
     
     if rag_client:
         try:
-            lightrag_connected = rag_client.test_lightrag_server_connection()
+            lightrag_connected = await rag_client.test_lightrag_server_connection()
         except Exception:
             pass
     
@@ -229,32 +231,34 @@ async def webhook_trigger(
             
             pages_response = query.limit(request.max_pages).execute()
             
-            # Process each page
-            for page in pages_response.data:
-                try:
-                    logger.info(f"[WEBHOOK] Processing page {page['id']}: {page['url']}")
-                    
-                    result = await rag_client.process_specific_page_to_lightrag(
-                        page['id'],
-                        fast_mode=request.fast_mode
-                    )
-                    
-                    results["processed"] += 1
-                    
-                    if "error" not in result:
-                        results["successful"] += 1
-                        results["pages"].append({"page_id": page['id'], "status": "success"})
-                    else:
-                        results["failed"] += 1
-                        results["pages"].append({"page_id": page['id'], "status": "failed", "error": result["error"]})
-                    
-                    # Small delay between pages
-                    await asyncio.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"[ERROR] Failed to process page {page['id']}: {e}")
+            # Process pages concurrently; the client's adaptive limiter paces LightRAG requests
+            semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+            
+            async def process_one(page):
+                async with semaphore:
+                    try:
+                        logger.info(f"[WEBHOOK] Processing page {page['id']}: {page['url']}")
+                        
+                        result = await rag_client.process_specific_page_to_lightrag(
+                            page['id'],
+                            fast_mode=request.fast_mode
+                        )
+                        
+                        if "error" not in result:
+                            return {"page_id": page['id'], "status": "success"}
+                        return {"page_id": page['id'], "status": "failed", "error": result["error"]}
+                        
+                    except Exception as e:
+                        logger.error(f"[ERROR] Failed to process page {page['id']}: {e}")
+                        return {"page_id": page['id'], "status": "error", "error": str(e)}
+            
+            for page_result in await asyncio.gather(*(process_one(page) for page in pages_response.data)):
+                results["processed"] += 1
+                if page_result["status"] == "success":
+                    results["successful"] += 1
+                else:
                     results["failed"] += 1
-                    results["pages"].append({"page_id": page['id'], "status": "error", "error": str(e)})
+                results["pages"].append(page_result)
         
         else:
             raise HTTPException(
@@ -425,32 +429,32 @@ async def batch_process_pages(
             detail="Batch processing limited to 10 pages at a time"
         )
     
-    results = []
     start_time = datetime.now()
+    semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
     
-    for page_id in page_ids:
-        try:
-            logger.info(f"[BATCH] Batch processing page {page_id}")
-            result = await rag_client.process_specific_page_to_lightrag(
-                page_id,
-                fast_mode=fast_mode
-            )
-            results.append({
-                "page_id": page_id,
-                "success": "error" not in result,
-                "result": result
-            })
-            
-            # Small delay between pages
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            logger.error(f"[ERROR] Error processing page {page_id} in batch: {e}")
-            results.append({
-                "page_id": page_id,
-                "success": False,
-                "error": str(e)
-            })
+    async def process_one(page_id):
+        async with semaphore:
+            try:
+                logger.info(f"[BATCH] Batch processing page {page_id}")
+                result = await rag_client.process_specific_page_to_lightrag(
+                    page_id,
+                    fast_mode=fast_mode
+                )
+                return {
+                    "page_id": page_id,
+                    "success": "error" not in result,
+                    "result": result
+                }
+            except Exception as e:
+                logger.error(f"[ERROR] Error processing page {page_id} in batch: {e}")
+                return {
+                    "page_id": page_id,
+                    "success": False,
+                    "error": str(e)
+                }
+    
+    # No fixed delay between pages: the client's adaptive limiter paces LightRAG requests
+    results = await asyncio.gather(*(process_one(page_id) for page_id in page_ids))
     
     processing_time = (datetime.now() - start_time).total_seconds()
     successful = len([r for r in results if r["success"]])
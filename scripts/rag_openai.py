@@ -0,0 +1,237 @@
+"""
+OpenAI model helpers shared by the RAGAnything scripts
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+from lightrag.llm.openai import openai_complete_if_cache, openai_embed
+
+from scripts.async_utils import MicroBatcher
+
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_DIM = 3072
+
+BATCH_MAX = 128
+BATCH_MS = 10
+EMBED_CONCURRENCY = 4  # sub-batch requests to OpenAI in flight at once
+
+CACHE_CAPACITY = 10_000
+CACHE_TTL = 30 * 24 * 3600  # seconds
+# On-disk vector encoding: float16 (default), int8 (per-vector scale) or float32
+CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16").lower()
+
+
+class BatchedEmbedder:
+    """Coalesce embedding requests into large, length-sorted OpenAI calls
+
+    Single-text calls are queued and flushed together every BATCH_MS
+    milliseconds (or once BATCH_MAX texts are waiting); multi-text calls
+    are split into length-sorted sub-batches that are sent concurrently,
+    at most EMBED_CONCURRENCY at a time.
+    """
+
+    def __init__(self, embed_fn, batch_max=BATCH_MAX, batch_ms=BATCH_MS, embedding_dim=EMBEDDING_DIM,
+                 max_concurrency=EMBED_CONCURRENCY):
+        self.embed_fn = embed_fn
+        self.batch_max = batch_max
+        self.batch_ms = batch_ms
+        self.embedding_dim = embedding_dim
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._batcher = MicroBatcher(self._embed_many, batch_max, batch_ms)
+
+    async def __call__(self, texts):
+        texts = list(texts)
+        if len(texts) == 1:
+            return np.asarray([await self._embed_one(texts[0])])
+        return await self._embed_many(texts)
+
+    async def _embed_many(self, texts):
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+
+        # Sort by length so each request carries similarly sized inputs
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sub_batches = [order[i:i + self.batch_max] for i in range(0, len(order), self.batch_max)]
+
+        # Cap parallel OpenAI calls so large inserts don't trip rate limits
+        async def embed_sub_batch(sub):
+            async with self._semaphore:
+                return await self.embed_fn([texts[i] for i in sub])
+
+        results = await asyncio.gather(*[embed_sub_batch(sub) for sub in sub_batches])
+
+        vectors = [None] * len(texts)
+        for sub, embeddings in zip(sub_batches, results):
+            for i, vec in zip(sub, embeddings):
+                vectors[i] = vec
+        return np.asarray(vectors)
+
+    async def _embed_one(self, text):
+        return await (await self._batcher.submit(text))
+
+    async def close(self):
+        """Stop the background batcher once queued texts have been embedded"""
+        await self._batcher.close()
+
+
+class CachedEmbedder:
+    """Two-tier embedding cache in front of an embedding function
+
+    Vectors are looked up in an in-process LRU first, then in a diskcache
+    store under cache_dir (when diskcache is installed). Only the misses
+    are sent to the wrapped function, and results are spliced back in
+    input order. Disk entries are quantized to `dtype` and decoded back
+    to float32 on read.
+    """
+
+    def __init__(self, embed_fn, model, cache_dir=None, capacity=CACHE_CAPACITY, ttl=CACHE_TTL, dtype=CACHE_DTYPE):
+        if dtype not in ("float16", "int8", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        self.embed_fn = embed_fn
+        self.model = model
+        self.dtype = dtype
+        self.embedding_dim = getattr(embed_fn, "embedding_dim", EMBEDDING_DIM)
+        self.capacity = capacity
+        self.ttl = ttl
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._disk = None
+        if cache_dir and DISKCACHE_AVAILABLE:
+            self._disk = diskcache.Cache(os.path.join(cache_dir, "emb_cache"))
+        elif cache_dir:
+            logger.warning("diskcache not installed - embedding cache is in-memory only")
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    def _mem_get(self, key):
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is None:
+                return None
+            vec, expires_at = entry
+            if expires_at < time.time():
+                del self._mem[key]
+                return None
+            self._mem.move_to_end(key)
+            return vec
+
+    def _mem_put(self, key, vec, expires_at):
+        with self._lock:
+            self._mem[key] = (vec, expires_at)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.capacity:
+                self._mem.popitem(last=False)
+
+    def _encode(self, vec):
+        vec = np.asarray(vec, dtype=np.float32)
+        if self.dtype == "int8":
+            max_abs = float(np.max(np.abs(vec))) if vec.size else 0.0
+            scale = max_abs / 127 if max_abs else 1.0
+            return pickle.dumps((scale, np.round(vec / scale).astype(np.int8)))
+        if self.dtype == "float32":
+            return pickle.dumps(vec)
+        return pickle.dumps(vec.astype(np.float16))
+
+    @staticmethod
+    def _decode(blob):
+        value = pickle.loads(blob)
+        if isinstance(value, tuple):
+            scale, q = value
+            return q.astype(np.float32) * scale
+        return value.astype(np.float32)
+
+    async def __call__(self, texts):
+        texts = list(texts)
+        keys = [self._key(t) for t in texts]
+        vectors = [None] * len(texts)
+        miss_idx = []
+
+        for i, key in enumerate(keys):
+            vec = self._mem_get(key)
+            if vec is not None:
+                self._stats["memory_hits"] += 1
+                vectors[i] = vec
+                continue
+            if self._disk is not None:
+                blob = self._disk.get(key)
+                if blob is not None:
+                    self._stats["disk_hits"] += 1
+                    vec = self._decode(blob)
+                    self._mem_put(key, vec, time.time() + self.ttl)
+                    vectors[i] = vec
+                    continue
+            miss_idx.append(i)
+
+        if miss_idx:
+            self._stats["misses"] += len(miss_idx)
+            embeddings = await self.embed_fn([texts[i] for i in miss_idx])
+            expires_at = time.time() + self.ttl
+            for i, vec in zip(miss_idx, embeddings):
+                vec = np.asarray(vec, dtype=np.float32)
+                vectors[i] = vec
+                self._mem_put(keys[i], vec, expires_at)
+                if self._disk is not None:
+                    self._disk.set(keys[i], self._encode(vec), expire=self.ttl)
+
+        return np.asarray(vectors)
+
+    async def close(self):
+        """Close the wrapped embedder (if it has a close) and the disk cache"""
+        close = getattr(self.embed_fn, "close", None)
+        if close is not None:
+            await close()
+        if self._disk is not None:
+            self._disk.close()
+
+    def cache_stats(self):
+        """Return hit/miss counters and current cache sizes"""
+        lookups = sum(self._stats.values())
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        return {
+            **self._stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._mem),
+            "disk_entries": len(self._disk) if self._disk is not None else 0,
+        }
+
+
+def _llm(api_key, prompt, system_prompt=None, history_messages=None, **kwargs):
+    return openai_complete_if_cache(
+        LLM_MODEL,
+        prompt,
+        system_prompt=system_prompt,
+        history_messages=history_messages or [],
+        api_key=api_key,
+        **kwargs,
+    )
+
+
+def make_llm_func(api_key):
+    """Build the LLM completion function passed to LightRAG"""
+    return partial(_llm, api_key)
+
+
+def make_embedding_func(api_key, model=EMBEDDING_MODEL, cache_dir=None):
+    """Build the cached, batched embedding function passed to LightRAG"""
+    embed = partial(openai_embed, model=model, api_key=api_key)
+    return CachedEmbedder(BatchedEmbedder(embed), model, cache_dir=cache_dir)
@@ -78,6 +78,7 @@ security = HTTPBearer()
 # Global variables for RAG instance
 rag_instance = None
 supabase_client = None
+http_session = None
 processing_jobs = {}
 
 # Pydantic models
@@ -222,6 +223,18 @@ def get_supabase_client() -> Client:
     
     return supabase_client
 
+# Shared HTTP session for PDF downloads and LightRAG uploads
+def get_http_session() -> aiohttp.ClientSession:
+    """Get or create the keep-alive aiohttp session"""
+    global http_session
+    
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+        )
+    
+    return http_session
+
 # Helper functions
 async def fetch_page_data(page_id: int) -> Dict[str, Any]:
     """Fetch page data from Supabase"""
@@ -256,17 +269,17 @@ async def fetch_datasheets(page_id: int, limit: int = 10) -> List[Dict[str, Any]
 async def download_pdf(url: str, output_path: str) -> bool:
     """Download PDF from URL to local path"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as response:
-                if response.status == 200:
-                    content = await response.read()
-                    with open(output_path, 'wb') as f:
-                        f.write(content)
-                    logger.info(f"Downloaded PDF: {url} -> {output_path}")
-                    return True
-                else:
-                    logger.error(f"Failed to download PDF: {url} (status: {response.status})")
-                    return False
+        session = get_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+            if response.status == 200:
+                with open(output_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(1 << 20):
+                        f.write(chunk)
+                logger.info(f"Downloaded PDF: {url} -> {output_path}")
+                return True
+            else:
+                logger.error(f"Failed to download PDF: {url} (status: {response.status})")
+                return False
     except Exception as e:
         logger.error(f"Error downloading PDF {url}: {e}")
         return False
@@ -280,36 +293,36 @@ async def upload_to_lightrag_server(content: str, metadata: dict = None) -> dict
         return {"error": "LightRAG server URL or API key not configured"}
     
     try:
-        async with aiohttp.ClientSession() as session:
-            # Format according to LightRAG API specification
-            file_source = "Unknown"
-            if metadata:
-                file_source = f"Page_{metadata.get('page_id', 'unknown')}_Datasheet_{metadata.get('datasheet_id', 'unknown')}"
-                if metadata.get('pdf_path'):
-                    file_source += f"__{os.path.basename(metadata['pdf_path'])}"
-            
-            data = {
-                "text": content,
-                "file_source": file_source
-            }
-            
-            headers = {
-                "X-API-Key": api_key,
-                "Content-Type": "application/json"
-            }
-            
-            url = f"{server_url}/documents/text"
-            
-            async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    logger.info(f"Document uploaded to LightRAG server successfully")
-                    return {"success": True, "result": result}
-                else:
-                    error_text = await response.text()
-                    logger.error(f"LightRAG upload failed (status {response.status}): {error_text}")
-                    return {"error": f"HTTP {response.status}: {error_text}"}
-                    
+        session = get_http_session()
+        # Format according to LightRAG API specification
+        file_source = "Unknown"
+        if metadata:
+            file_source = f"Page_{metadata.get('page_id', 'unknown')}_Datasheet_{metadata.get('datasheet_id', 'unknown')}"
+            if metadata.get('pdf_path'):
+                file_source += f"__{os.path.basename(metadata['pdf_path'])}"
+        
+        data = {
+            "text": content,
+            "file_source": file_source
+        }
+        
+        headers = {
+            "X-API-Key": api_key,
+            "Content-Type": "application/json"
+        }
+        
+        url = f"{server_url}/documents/text"
+        
+        async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=120)) as response:
+            if response.status == 200:
+                result = await response.json()
+                logger.info(f"Document uploaded to LightRAG server successfully")
+                return {"success": True, "result": result}
+            else:
+                error_text = await response.text()
+                logger.error(f"LightRAG upload failed (status {response.status}): {error_text}")
+                return {"error": f"HTTP {response.status}: {error_text}"}
+                
     except Exception as e:
         logger.error(f"Error uploading to LightRAG server: {e}")
         return {"error": str(e)}
@@ -420,10 +433,8 @@ Due to processing limitations, detailed content extraction was not available. Th
         
         # Add image references to content if images were uploaded
         if uploaded_images:
-            image_refs = "\n\n## Extracted Images\n"
-            for img in uploaded_images:
-                image_refs += f"- ![Image {img['index']}]({img['url']}) - {img['filename']}\n"
-            rag_content += image_refs
+            image_refs = [f"- ![Image {img['index']}]({img['url']}) - {img['filename']}\n" for img in uploaded_images]
+            rag_content += "\n\n## Extracted Images\n" + "".join(image_refs)
         
         # Create comprehensive metadata
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -615,10 +626,8 @@ Due to processing limitations, detailed content extraction was not available. Th
         
         # Add image references to content if images were uploaded
         if uploaded_images:
-            image_refs = "\n\n## Extracted Images\n"
-            for img in uploaded_images:
-                image_refs += f"- ![Image {img['index']}]({img['url']}) - {img['filename']}\n"
-            rag_content += image_refs
+            image_refs = [f"- ![Image {img['index']}]({img['url']}) - {img['filename']}\n" for img in uploaded_images]
+            rag_content += "\n\n## Extracted Images\n" + "".join(image_refs)
         
         # Create comprehensive metadata
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -960,6 +969,12 @@ async def startup_event():
     await initialize_rag()
     logger.info("API service started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared HTTP session"""
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+
 @app.get("/")
 async def root():
     """Root endpoint"""